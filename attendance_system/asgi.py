@@ -5,4 +5,18 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'attendance_system.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after Django is set up since it loads models
+from core.face_pool import warm_up_web_process  # noqa: E402
+from core.kiosk import kiosk_websocket  # noqa: E402
+
+warm_up_web_process()
+
+
+async def application(scope, receive, send):
+    # Streaming kiosks connect over WebSocket; everything else is plain Django.
+    # Serve with an ASGI server, e.g. uvicorn attendance_system.asgi:application
+    if scope['type'] == 'websocket':
+        return await kiosk_websocket(scope, receive, send)
+    return await django_application(scope, receive, send)
@@ -19,6 +19,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.FacePoolBusyMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -54,6 +56,26 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Several kiosks write at once. WAL lets reads run alongside a write;
+        # writers wait up to timeout seconds for the lock instead of failing
+        # with "database is locked"; IMMEDIATE transactions take the write
+        # lock at BEGIN, so two transactions never deadlock upgrading a read lock.
+        'OPTIONS': {
+            'timeout': 20,
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL',
+        },
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+    }
+}
+
+# File-based so invalidations made by one process (web workers, encoding_worker)
+# are seen by all of them without running a cache server
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / '.cache',
     }
 }
 AUTH_PASSWORD_VALIDATORS = [
@@ -86,3 +108,21 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 FACE_RECOGNITION_TOLERANCE = 0.6
 FACE_RECOGNITION_MODEL = 'hog'
+FACE_DETECTION_MAX_SIZE = 640  # longest side (px) used for detection; None to detect at full size
+FACE_GROUP_DETECTION_MAX_SIZE = None  # the same for group photos, whose faces are small; None is full size
+FACE_GALLERY_CACHE_SIZE = 32  # courses kept in each worker's gallery cache
+FACE_GALLERY_CACHE_TTL = 300  # seconds before a cached gallery is reloaded even if no student changed
+FACE_ENCODING_STORAGE = 'float32'  # or 'float16' to halve encoding size
+FACE_INDEX_PATH = os.path.join(BASE_DIR, 'face_index.npz')
+FACE_INDEX_NPROBE = 8  # IVF lists scanned per institution-wide search
+FACE_INDEX_UNTRAINED_TTL = 300  # seconds between reloads of the brute-force index used until build_face_index runs
+FACE_ENCODING_BACKGROUND = False  # queue encodings for manage.py encoding_worker; enable only where it runs
+FACE_TEMPLATES_PER_STUDENT = 5  # webcam frames encoded as templates at enrollment
+FACE_POOL_WORKERS = 2  # processes per web process for detection and encoding; 0 to encode in the request thread
+FACE_POOL_QUEUE_DEPTH = 4  # calls waiting for a pool process before requests get 429
+FACE_POOL_TIMEOUT = 30  # seconds a request waits for its result
+FACE_POOL_RETRY_AFTER = 2  # Retry-After seconds sent with 429
+SESSION_PRESENCE_CACHE_SIZE = 64  # sessions whose present set each worker keeps in memory
+SESSION_PRESENCE_CACHE_TTL = 60  # seconds before a cached present set is reloaded
+PHOTO_MAX_SIZE = 1280  # longest side (px) stored for student and attendance photos
+PHOTO_JPEG_QUALITY = 85
@@ -6,3 +6,10 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'attendance_system.settings')
 
 application = get_wsgi_application()
+
+# Imported after Django is set up since it reads settings
+from core.face_pool import warm_up_web_process  # noqa: E402
+
+# Loads face_recognition (or starts the face pool) before the first request.
+# Keep gunicorn's preload_app off: a started pool does not survive a fork.
+warm_up_web_process()
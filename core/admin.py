@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Course, Student, AttendanceSession, Attendance
+from .models import Course, Student, AttendanceSession, Attendance, EncodingJob
 
 
 @admin.register(Course)
@@ -11,20 +11,27 @@ class CourseAdmin(admin.ModelAdmin):
 
 @admin.register(Student)
 class StudentAdmin(admin.ModelAdmin):
-    list_display = ['registration_number', 'name', 'email', 'course', 'is_active', 'created_at']
+    list_display = ['registration_number', 'name', 'email', 'course', 'encoding_status', 'is_active', 'created_at']
     search_fields = ['registration_number', 'name', 'email']
-    list_filter = ['course', 'is_active', 'created_at']
-    readonly_fields = ['face_encoding']
+    list_filter = ['course', 'encoding_status', 'is_active', 'created_at']
+    readonly_fields = ['face_encoding_status', 'encoding_status', 'encoding_version']
     
     fieldsets = (
         ('Basic Information', {
             'fields': ('registration_number', 'name', 'email', 'phone', 'course')
         }),
         ('Face Recognition', {
-            'fields': ('photo', 'face_encoding', 'is_active'),
+            'fields': ('photo', 'face_encoding_status', 'encoding_status', 'encoding_version', 'is_active'),
             'description': 'Upload a clear photo for face recognition. Face encoding will be generated automatically.'
         }),
     )
+    
+    @admin.display(description='Face encoding')
+    def face_encoding_status(self, obj):
+        if not obj.face_encoding:
+            return 'Not generated'
+        stale = '' if obj.has_current_encoding else ' (outdated model, run manage.py reencode_faces)'
+        return f'{obj.template_count} template(s), {len(obj.face_encoding)} bytes{stale}'
 
 
 @admin.register(AttendanceSession)
@@ -42,3 +49,11 @@ class AttendanceAdmin(admin.ModelAdmin):
     list_filter = ['status', 'marked_by', 'session__session_date']
     date_hierarchy = 'marked_at'
     readonly_fields = ['marked_at', 'confidence_score']
+
+
+@admin.register(EncodingJob)
+class EncodingJobAdmin(admin.ModelAdmin):
+    list_display = ['student', 'status', 'attempts', 'created_at', 'finished_at']
+    search_fields = ['student__name', 'student__registration_number']
+    list_filter = ['status', 'created_at']
+    readonly_fields = ['created_at', 'started_at', 'finished_at', 'claimed_by', 'error']
@@ -0,0 +1,90 @@
+import uuid
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Student, EncodingJob
+from .face_recognition_utils import get_face_service
+from .face_index import student_index
+
+
+def enqueue_encoding(student):
+    """Queue a face encoding for the student unless one is already queued"""
+    with transaction.atomic():
+        if not EncodingJob.objects.filter(student=student, status__in=['pending', 'running']).exists():
+            EncodingJob.objects.create(student=student)
+        if student.encoding_status != 'pending':
+            Student.objects.filter(pk=student.pk).update(encoding_status='pending')
+    student.encoding_status = 'pending'
+
+
+def reclaim_stale_jobs(timeout_seconds):
+    """Return jobs left 'running' by a crashed worker to the queue"""
+    cutoff = timezone.now() - timedelta(seconds=timeout_seconds)
+    return EncodingJob.objects.filter(status='running', started_at__lt=cutoff).update(
+        status='pending', claimed_by=''
+    )
+
+
+def claim_jobs(limit):
+    """Atomically claim up to limit pending jobs for this worker"""
+    token = uuid.uuid4().hex
+    job_ids = list(
+        EncodingJob.objects.filter(status='pending').order_by('created_at').values_list('id', flat=True)[:limit]
+    )
+    if not job_ids:
+        return []
+
+    # The status check in the UPDATE keeps two workers from claiming the same job
+    EncodingJob.objects.filter(id__in=job_ids, status='pending').update(
+        status='running', claimed_by=token, started_at=timezone.now()
+    )
+    return list(
+        EncodingJob.objects.filter(claimed_by=token, status='running').select_related('student')
+    )
+
+
+def complete_job(job, encoding_bytes):
+    """Store the encoding; returns False if the face duplicates another student"""
+    student = job.student
+    face_service = get_face_service()
+
+    duplicates = [
+        student_id for student_id, distance in student_index.search(face_service.bytes_to_encoding(encoding_bytes), k=2)
+        if student_id != student.pk and distance <= face_service.tolerance
+    ]
+    if duplicates:
+        existing = Student.objects.get(pk=duplicates[0])
+        fail_job(job, f'Face already registered as {existing.registration_number} - {existing.name}', retryable=False)
+        return False
+
+    with transaction.atomic():
+        student.face_encoding = encoding_bytes
+        student.encoding_status = 'ready'
+        # Pool processes run the same install and model as this one
+        student.encoding_version = face_service.encoding_version
+        # save() rather than update() so the gallery cache and index signals fire
+        student.save(update_fields=['face_encoding', 'encoding_status', 'encoding_version'])
+        job.status = 'done'
+        job.attempts += 1
+        job.error = ''
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'attempts', 'error', 'finished_at'])
+    return True
+
+
+def fail_job(job, error, retryable=True):
+    job.attempts += 1
+    job.error = error
+    if retryable and job.attempts < job.max_attempts:
+        job.status = 'pending'
+        job.claimed_by = ''
+        job.save(update_fields=['status', 'attempts', 'error', 'claimed_by'])
+        return
+
+    with transaction.atomic():
+        job.status = 'failed'
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'attempts', 'error', 'finished_at'])
+        Student.objects.filter(pk=job.student_id).update(encoding_status='failed')
@@ -0,0 +1,440 @@
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+from .gallery import ENCODING_SIZE
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+def _squared_distances(queries, points, point_norms=None):
+    if point_norms is None:
+        point_norms = np.einsum('ij,ij->i', points, points)
+    query_norms = np.einsum('ij,ij->i', queries, queries)
+    squared = query_norms[:, None] + point_norms[None, :] - 2.0 * queries.dot(points.T)
+    return np.maximum(squared, 0.0)
+
+
+@contextmanager
+def _file_lock(path):
+    """Hold an exclusive lock on path, shared by every process using the same file"""
+    with open(path, 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            # Blocks like flock, except that it gives up with OSError after ~10 s
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+# k-means trains on at most this many rows per list, which is plenty for
+# stable centroids and keeps a build to seconds however many students there are
+TRAINING_SAMPLES_PER_LIST = 64
+# Rows assigned to their nearest centroid at a time, bounding the distance matrix
+ASSIGN_CHUNK_SIZE = 4096
+
+
+def nearest_centroids(points, centroids):
+    """Index of the closest centroid for every point."""
+    centroid_norms = np.einsum('ij,ij->i', centroids, centroids)
+    labels = np.empty(len(points), dtype=np.int32)
+    for start in range(0, len(points), ASSIGN_CHUNK_SIZE):
+        chunk = points[start:start + ASSIGN_CHUNK_SIZE]
+        labels[start:start + len(chunk)] = np.argmin(_squared_distances(chunk, centroids, centroid_norms), axis=1)
+    return labels
+
+
+def kmeans(points, n_clusters, iterations=10, seed=0):
+    """Plain Lloyd's k-means on a random sample of points; returns float32 centroids."""
+    rng = np.random.default_rng(seed)
+    n_clusters = min(n_clusters, len(points))
+    max_samples = n_clusters * TRAINING_SAMPLES_PER_LIST
+    if len(points) > max_samples:
+        points = points[rng.choice(len(points), max_samples, replace=False)]
+    centroids = points[rng.choice(len(points), n_clusters, replace=False)].copy()
+
+    for _ in range(iterations):
+        labels = nearest_centroids(points, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, points)
+        counts = np.bincount(labels, minlength=n_clusters)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+        # Re-seed empty clusters from random points so every list stays usable
+        empty = np.flatnonzero(~filled)
+        if len(empty):
+            centroids[empty] = points[rng.choice(len(points), len(empty), replace=False)]
+
+    return centroids.astype(np.float32)
+
+
+class IVFIndex:
+    """Inverted-file index over student encodings.
+
+    Encodings are partitioned by k-means into lists; a query only scans the
+    n_probe lists whose centroids are closest to it. A student may own several
+    rows (one per template). Students can be added and removed without
+    retraining; call train() again after large changes.
+    """
+
+    def __init__(self, n_lists=None, n_probe=8, version=''):
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        # Encoding version of every row, see FaceRecognitionService.encoding_version
+        self.version = version
+        self.centroids = np.empty((0, ENCODING_SIZE), dtype=np.float32)
+        self.student_ids = np.empty(0, dtype=np.int64)
+        self.encodings = np.empty((0, ENCODING_SIZE), dtype=np.float32)
+        self.labels = np.empty(0, dtype=np.int32)
+        self._offsets = None
+        self._norms = None
+
+    def __len__(self):
+        return len(self.student_ids)
+
+    def __contains__(self, student_id):
+        return bool((self.student_ids == student_id).any())
+
+    @property
+    def is_trained(self):
+        return len(self.centroids) > 0
+
+    def train(self, student_ids, encodings, seed=0):
+        self.student_ids = np.asarray(student_ids, dtype=np.int64)
+        self.encodings = np.ascontiguousarray(encodings, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+
+        if not len(self.student_ids):
+            self.centroids = np.empty((0, ENCODING_SIZE), dtype=np.float32)
+            self.labels = np.empty(0, dtype=np.int32)
+        else:
+            n_lists = self.n_lists or max(1, int(np.sqrt(len(self.student_ids))))
+            self.centroids = kmeans(self.encodings, n_lists, seed=seed)
+            self.labels = self._nearest_list(self.encodings)
+        self._offsets = None
+
+    def fill(self, student_ids, encodings):
+        """Hold the rows in a single list without training, so every search is brute force."""
+        self.student_ids = np.asarray(student_ids, dtype=np.int64)
+        self.encodings = np.ascontiguousarray(encodings, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+        if len(self.encodings):
+            self.centroids = self.encodings.mean(axis=0, keepdims=True)
+        else:
+            self.centroids = np.empty((0, ENCODING_SIZE), dtype=np.float32)
+        self.labels = np.zeros(len(self.student_ids), dtype=np.int32)
+        self._offsets = None
+
+    def add(self, student_id, encodings):
+        """Add or replace a student's templates (one encoding or a stack of them)."""
+        self.remove(student_id)
+        encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+
+        if not self.is_trained:
+            self.centroids = encodings[:1].copy()
+
+        self.student_ids = np.append(self.student_ids, [student_id] * len(encodings))
+        self.encodings = np.vstack([self.encodings, encodings])
+        self.labels = np.append(self.labels, self._nearest_list(encodings)).astype(np.int32)
+        self._offsets = None
+
+    def has_student(self, student_id, encodings):
+        """Whether the student's rows are exactly these encodings."""
+        encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+        return np.array_equal(self.encodings[self.student_ids == student_id], encodings)
+
+    def remove(self, student_id):
+        keep = self.student_ids != student_id
+        if keep.all():
+            return False
+        self.student_ids = self.student_ids[keep]
+        self.encodings = self.encodings[keep]
+        self.labels = self.labels[keep]
+        self._offsets = None
+        return True
+
+    def search(self, encoding, k=1, n_probe=None):
+        """Return up to k (student_id, distance) pairs, closest first."""
+        if not len(self):
+            return []
+
+        query = np.asarray(encoding, dtype=np.float32).reshape(1, ENCODING_SIZE)
+        n_probe = min(n_probe or self.n_probe, len(self.centroids))
+
+        centroid_distances = _squared_distances(query, self.centroids)[0]
+        probe = np.argpartition(centroid_distances, n_probe - 1)[:n_probe]
+
+        offsets = self._get_offsets()
+        rows = []
+        distances = []
+        for label in probe:
+            start, end = offsets[label], offsets[label + 1]
+            if start == end:
+                continue
+            # Lists are contiguous slices, so this is a view rather than a copy
+            squared = _squared_distances(query, self.encodings[start:end], self._norms[start:end])[0]
+            rows.append(np.arange(start, end))
+            distances.append(squared)
+        if not rows:
+            return []
+
+        rows = np.concatenate(rows)
+        distances = np.sqrt(np.concatenate(distances))
+        best = self._closest_per_student(rows, distances, k)
+        return [(int(self.student_ids[rows[i]]), float(distances[i])) for i in best]
+
+    def _closest_per_student(self, rows, distances, k):
+        """Positions of the k closest rows, keeping each student's closest template only."""
+        if k == 1:
+            return [int(np.argmin(distances))]
+        # Students rarely have more than a few templates, so a few times k
+        # candidates almost always hold k distinct students
+        candidates = min(len(rows), k * 8)
+        while True:
+            order = np.argpartition(distances, candidates - 1)[:candidates]
+            order = order[np.argsort(distances[order], kind='stable')]
+            _, first = np.unique(self.student_ids[rows[order]], return_index=True)
+            if len(first) >= k or candidates == len(rows):
+                return order[np.sort(first)[:k]]
+            candidates = min(len(rows), candidates * 4)
+
+    def save(self, path):
+        # Write to a temporary file and rename so readers never see a partial index
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.npz')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(
+                    f,
+                    centroids=self.centroids,
+                    student_ids=self.student_ids,
+                    encodings=self.encodings,
+                    labels=self.labels,
+                    n_probe=self.n_probe,
+                    version=self.version,
+                )
+            os.replace(tmp_path, path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            # Files saved before versioning have no version and are rebuilt
+            version = str(data['version']) if 'version' in data else ''
+            index = cls(n_probe=int(data['n_probe']), version=version)
+            index.centroids = data['centroids']
+            index.student_ids = data['student_ids']
+            index.encodings = data['encodings']
+            index.labels = data['labels']
+        index.n_lists = len(index.centroids)
+        return index
+
+    def _nearest_list(self, encodings):
+        return nearest_centroids(encodings, self.centroids)
+
+    def _get_offsets(self):
+        """Sort rows by list so each list is one contiguous slice; return list offsets."""
+        if self._offsets is None:
+            order = np.argsort(self.labels, kind='stable')
+            self.student_ids = self.student_ids[order]
+            self.encodings = np.ascontiguousarray(self.encodings[order])
+            self.labels = self.labels[order]
+            self._norms = np.einsum('ij,ij->i', self.encodings, self.encodings)
+            self._offsets = np.searchsorted(self.labels, np.arange(len(self.centroids) + 1))
+        return self._offsets
+
+
+class StudentIndex:
+    """Process-wide IVF index over all active students, persisted to disk.
+
+    The trained index is written by manage.py build_face_index (run on
+    deploy) and the commands that change many students, never in a request.
+    Other worker processes notice a newer index file by its modification
+    time and reload it before the next search. Changes are applied to the
+    latest file under a lock on path + '.lock', so writers in different
+    processes never overwrite each other's changes.
+
+    Until a trained index for the current encoding version exists, each
+    process loads the students into an untrained index and searches it by
+    brute force, reloading it from the database every FACE_INDEX_UNTRAINED_TTL
+    seconds to see students saved by other processes.
+    """
+
+    def __init__(self, path=None):
+        self._path = path
+        self._index = None
+        # Modification time of the file the index was loaded from; None while untrained
+        self._mtime = None
+        self._checked_mtime = None
+        self._loaded_at = None
+        # Inside deferred_saves(): whether changes are waiting to be written
+        self._deferred = False
+        self._dirty = False
+        self._lock = threading.RLock()
+
+    @property
+    def path(self):
+        if self._path is None:
+            from django.conf import settings
+            return getattr(settings, 'FACE_INDEX_PATH', os.path.join(settings.BASE_DIR, 'face_index.npz'))
+        return self._path
+
+    @contextmanager
+    def using_path(self, path):
+        """Read and write the index at path inside the with block, e.g. beside a throwaway database"""
+        with self._lock:
+            old_path = self._path
+            self._path = path
+            self._reset()
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._path = old_path
+                self._reset()
+
+    @contextmanager
+    def deferred_saves(self):
+        """Keep changes in memory inside the with block and write the file once at the end, for bulk deletes"""
+        with self._lock:
+            self._deferred = True
+        try:
+            yield self
+        finally:
+            with self._lock, _file_lock(self.path + '.lock'):
+                self._deferred = False
+                if self._dirty:
+                    self._dirty = False
+                    self._save()
+
+    def get(self):
+        with self._lock:
+            return self._refresh()
+
+    def is_trained(self):
+        """Whether searches use a trained index file for the current encoding version"""
+        with self._lock:
+            self._load_file()
+            return self._mtime is not None
+
+    def rebuild(self):
+        """Train the index from the database and save it; for management commands"""
+        with self._lock, _file_lock(self.path + '.lock'):
+            self._index = self._build(train=True)
+            self._save()
+            return self._index
+
+    def search(self, encoding, k=1):
+        with self._lock:
+            return self.get().search(encoding, k=k)
+
+    def update_student(self, student, encodings):
+        with self._lock, _file_lock(self.path + '.lock'):
+            index = self._refresh()
+            if student.is_active and encodings is not None:
+                # Most saves (a new phone number) leave the encoding alone; the file is not rewritten
+                if index.has_student(student.pk, encodings):
+                    return
+                index.add(student.pk, encodings)
+            elif not index.remove(student.pk):
+                return
+            self._changed()
+
+    def remove_student(self, student_id):
+        with self._lock, _file_lock(self.path + '.lock'):
+            if self._refresh().remove(student_id):
+                self._changed()
+
+    def _changed(self):
+        # Only a trained index has a file to keep up to date
+        if self._mtime is None:
+            return
+        if self._deferred:
+            self._dirty = True
+        else:
+            self._save()
+
+    def _file_mtime(self):
+        return os.path.getmtime(self.path) if os.path.exists(self.path) else None
+
+    def _reset(self):
+        self._index = None
+        self._mtime = None
+        self._checked_mtime = None
+        self._loaded_at = None
+        self._dirty = False
+
+    def _refresh(self):
+        """Load the index file if it changed, else fall back to an untrained index."""
+        self._load_file()
+        if self._index is None or (self._mtime is None and self._untrained_expired()):
+            self._index = self._build(train=False)
+            self._loaded_at = time.monotonic()
+        return self._index
+
+    def _load_file(self):
+        mtime = self._file_mtime()
+        if mtime is not None and mtime != self._checked_mtime:
+            self._checked_mtime = mtime
+            index = IVFIndex.load(self.path)
+            # A file trained for another encoding version waits for build_face_index
+            if index.version == self._current_version():
+                self._index = index
+                self._mtime = mtime
+
+    def _untrained_expired(self):
+        from django.conf import settings
+        ttl = getattr(settings, 'FACE_INDEX_UNTRAINED_TTL', 300)
+        return bool(ttl) and time.monotonic() - self._loaded_at >= ttl
+
+    def _build(self, train):
+        from django.conf import settings
+        from .models import Student
+        from .face_recognition_utils import get_face_service
+
+        face_service = get_face_service()
+        student_ids = []
+        encodings = []
+        rows = Student.objects.filter(
+            is_active=True, encoding_version=face_service.encoding_version
+        ).exclude(face_encoding=b'').values_list('id', 'face_encoding')
+        for student_id, face_encoding in rows.iterator(chunk_size=2000):
+            templates = face_service.bytes_to_encodings(face_encoding)
+            if templates is not None:
+                student_ids.extend([student_id] * len(templates))
+                encodings.append(templates)
+
+        index = IVFIndex(n_probe=getattr(settings, 'FACE_INDEX_NPROBE', 8), version=face_service.encoding_version)
+        encodings = np.vstack(encodings) if encodings else np.empty((0, ENCODING_SIZE), dtype=np.float32)
+        if train:
+            index.train(student_ids, encodings)
+        else:
+            index.fill(student_ids, encodings)
+        return index
+
+    def _current_version(self):
+        from .face_recognition_utils import get_face_service
+        return get_face_service().encoding_version
+
+    def _save(self):
+        self._index.save(self.path)
+        self._mtime = self._checked_mtime = os.path.getmtime(self.path)
+
+
+student_index = StudentIndex()
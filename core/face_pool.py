@@ -0,0 +1,160 @@
+"""A bounded process pool for face detection and encoding in web processes.
+
+dlib keeps a request thread busy for the whole detection and encoding run.
+With the pool started (see start_face_pool), FaceRecognitionService hands
+that work to a few pre-warmed processes instead, and admits at most
+FACE_POOL_WORKERS + FACE_POOL_QUEUE_DEPTH calls at a time. Further calls fail
+at once with FacePoolBusy, which the web layer answers with 429 and a
+Retry-After header, so web threads stay free for every other page.
+
+The pool belongs to one web process and is shared by its threads; serve with
+threads (gunicorn --worker-class gthread, or an ASGI server as in the Procfile)
+to benefit.
+"""
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from .face_recognition_utils import init_encoding_worker, warm_up, warm_up_worker
+from .metrics import registry
+
+
+class FacePoolBusy(Exception):
+    """No free slot in the face pool; the caller should retry after retry_after seconds"""
+
+    def __init__(self, retry_after):
+        super().__init__(f'Face recognition is busy, please retry in {retry_after}s')
+        self.retry_after = retry_after
+
+
+class FacePool:
+
+    def __init__(self, workers, queue_depth, timeout, retry_after, initargs):
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._initargs = initargs
+        self._slots = threading.BoundedSemaphore(workers + queue_depth)
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def start(self):
+        """Start the worker processes and wait until each has loaded face_recognition"""
+        executor = self._get_executor()
+        # Processes are started on demand, so one task each brings them all up
+        for future in [executor.submit(warm_up_worker) for _ in range(self.workers)]:
+            future.result()
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def run(self, fn, *args):
+        """Call fn(*args) in a worker process, or raise FacePoolBusy if the pool is full"""
+        if not self._slots.acquire(blocking=False):
+            registry.inc('face_pool_rejected_total', reason='saturated')
+            raise FacePoolBusy(self.retry_after)
+
+        executor = self._get_executor()
+        try:
+            future = executor.submit(fn, *args)
+        except BrokenProcessPool:
+            self._slots.release()
+            self._discard(executor)
+            registry.inc('face_pool_rejected_total', reason='broken')
+            raise FacePoolBusy(self.retry_after)
+        except BaseException:
+            self._slots.release()
+            raise
+        # The slot is held until the work is really done, not just until we stop waiting
+        future.add_done_callback(lambda _: self._slots.release())
+
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            registry.inc('face_pool_rejected_total', reason='timeout')
+            raise FacePoolBusy(self.retry_after)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); the next call starts a fresh pool
+            self._discard(executor)
+            registry.inc('face_pool_rejected_total', reason='broken')
+            raise FacePoolBusy(self.retry_after)
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    self.workers,
+                    # Forking a process that already runs request threads is unsafe
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=init_encoding_worker,
+                    initargs=self._initargs,
+                )
+            return self._executor
+
+    def _discard(self, executor):
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_face_pool():
+    """The started face pool of this process, or None to work in the calling thread"""
+    return _pool
+
+
+def start_face_pool():
+    """Create and warm up this process's face pool if FACE_POOL_WORKERS is set.
+
+    Web processes start it through warm_up_web_process; management commands
+    and the encoding worker never do and encode in their own processes.
+    """
+    from django.conf import settings
+    from .face_recognition_utils import encoding_worker_initargs, get_face_service
+
+    global _pool
+    workers = getattr(settings, 'FACE_POOL_WORKERS', 0)
+    if not workers:
+        return None
+
+    with _pool_lock:
+        if _pool is None:
+            face_service = get_face_service()
+            pool = FacePool(
+                workers=workers,
+                queue_depth=getattr(settings, 'FACE_POOL_QUEUE_DEPTH', workers * 2),
+                timeout=getattr(settings, 'FACE_POOL_TIMEOUT', 30),
+                retry_after=getattr(settings, 'FACE_POOL_RETRY_AFTER', 2),
+                initargs=encoding_worker_initargs(face_service),
+            )
+            pool.start()
+            _pool = pool
+    return _pool
+
+
+def warm_up_web_process():
+    """Make this web process ready to recognize faces before its first request.
+
+    Starts the face pool, whose processes load face_recognition themselves, or
+    without a pool loads it here. Called by the WSGI and ASGI entry points.
+    """
+    if start_face_pool() is None:
+        warm_up()
+
+
+def stop_face_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown()
@@ -1,35 +1,170 @@
-try:
-    import face_recognition
-except ImportError:
-    face_recognition = None
-
 import numpy as np
-from PIL import Image
+from PIL import Image, ImageOps
 import io
 import base64
+import functools
+import math
+import multiprocessing
+from importlib import metadata
+
+from .gallery import FaceGallery, ENCODING_SIZE
+from .metrics import record_stage, stage, start_request_timing, stop_request_timing
+
+
+_NOT_LOADED = object()
+_face_recognition = _NOT_LOADED
+
+
+def get_face_recognition():
+    """The face_recognition module, or None if it is not installed.
+
+    Importing it loads dlib and its model files, which takes seconds, so it
+    happens on first use: management commands and migrations that never
+    recognize a face skip it. Web processes load it up front with warm_up().
+    """
+    global _face_recognition
+    if _face_recognition is _NOT_LOADED:
+        try:
+            import face_recognition
+        except ImportError:
+            face_recognition = None
+        _face_recognition = face_recognition
+    return _face_recognition
+
+
+def warm_up():
+    """Load face_recognition and run it once, so the first real request is not slower"""
+    face_recognition = get_face_recognition()
+    if face_recognition is None:
+        return False
+    # A blank frame exercises the detector; a made-up box exercises the encoder
+    image = np.zeros((64, 64, 3), dtype=np.uint8)
+    face_recognition.face_locations(image)
+    face_recognition.face_encodings(image, [(8, 56, 56, 8)])
+    return True
+
+
+# Releases whose change can move encodings: the library, its model weights and dlib
+VERSIONED_PACKAGES = (
+    ('fr', 'face_recognition'),
+    ('frm', 'face_recognition_models'),
+    ('dlib', 'dlib'),
+)
+
+
+@functools.lru_cache(maxsize=None)
+def _package_versions():
+    # Read from package metadata, so this does not import face_recognition
+    versions = []
+    for label, package in VERSIONED_PACKAGES:
+        try:
+            versions.append(f'{label}{metadata.version(package)}')
+        except metadata.PackageNotFoundError:
+            versions.append(f'{label}-')
+    return '/'.join(versions)
+
+
+# Stored encodings are a one-byte format tag followed by little-endian floats
+ENCODING_FORMAT_FLOAT32 = 1
+ENCODING_FORMAT_FLOAT16 = 2
+
+ENCODING_DTYPES = {
+    ENCODING_FORMAT_FLOAT32: np.dtype('<f4'),
+    ENCODING_FORMAT_FLOAT16: np.dtype('<f2'),
+}
+
+
+def _offloaded(method):
+    """Run the method in the face pool's worker processes when the service has a pool"""
+    @functools.wraps(method)
+    def wrapper(self, *args):
+        if self.pool is None:
+            return method(self, *args)
+        # face_pool is the whole round trip, queueing included; the stages
+        # timed in the worker process are recorded here as well
+        with stage('face_pool'):
+            result, timings = self.pool.run(run_pooled, method.__name__, *args)
+        for name, elapsed in timings:
+            record_stage(name, elapsed)
+        return result
+    return wrapper
 
 
 class FaceRecognitionService:
 
-    def __init__(self, tolerance=0.6, model='hog'):
+    def __init__(self, tolerance=0.6, model='hog', storage_format=ENCODING_FORMAT_FLOAT32,
+                 detection_max_size=None, group_detection_max_size=None, pool=None):
         self.tolerance = tolerance
         self.model = model
-
+        self.storage_format = storage_format
+        self.detection_max_size = detection_max_size
+        # Faces in a group photo are a small part of the frame and get lost when it is downscaled
+        self.group_detection_max_size = group_detection_max_size
+        # A core.face_pool.FacePool; detection and encoding then run in its processes
+        self.pool = pool
+
+    @property
+    def encoding_version(self):
+        """Tag stored with every encoding; encodings with different tags are never compared"""
+        return f'{self.model}/{_package_versions()}'
+
+    def load_image(self, source):
+        # Accepts a file path or raw image bytes
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            source = io.BytesIO(source)
+        with stage('image_decode'):
+            # Phone photos are often stored sideways with an EXIF rotation
+            return ImageOps.exif_transpose(Image.open(source)).convert('RGB')
+
+
+    @_offloaded
+    def locate_faces(self, image):
+        """Detect on a downscaled copy of image; boxes come back in full-resolution coordinates."""
+        return self._locate_faces(image, self.detection_max_size)
+
+    def _locate_faces(self, image, max_size):
+        factor = 1
+        if max_size:
+            factor = max(1, math.ceil(max(image.size) / max_size))
+
+        with stage('detection'):
+            if factor == 1:
+                return get_face_recognition().face_locations(np.array(image), model=self.model)
+
+            # HOG cost grows with pixel count, so detection runs on the reduced image
+            small = image.reduce(factor)
+            face_locations = get_face_recognition().face_locations(np.array(small), model=self.model)
+
+        width, height = image.size
+        return [
+            (
+                min(top * factor, height),
+                min(right * factor, width),
+                min(bottom * factor, height),
+                min(left * factor, width),
+            )
+            for top, right, bottom, left in face_locations
+        ]
+
+
+    @_offloaded
     def encode_face(self, image_path):
 
-        if face_recognition is None:
+        if get_face_recognition() is None:
             print("face_recognition library not installed")
             return None
 
         try:
-            image = face_recognition.load_image_file(image_path)
+            image = self.load_image(image_path)
 
-            face_locations = face_recognition.face_locations(image, model=self.model)
+            face_locations = self.locate_faces(image)
 
             if not face_locations:
                 return None
 
-            face_encodings = face_recognition.face_encodings(image, face_locations)
+            # Encodings are computed from the original-resolution image
+            with stage('encoding'):
+                face_encodings = get_face_recognition().face_encodings(np.array(image), face_locations[:1])
 
             if not face_encodings:
                 return None
@@ -41,22 +176,23 @@ class FaceRecognitionService:
             return None
 
 
+    @_offloaded
     def encode_face_from_bytes(self, image_bytes):
 
-        if face_recognition is None:
+        if get_face_recognition() is None:
             print("face_recognition library not installed")
             return None
 
         try:
-            image = Image.open(io.BytesIO(image_bytes))
-            image_array = np.array(image)
+            image = self.load_image(image_bytes)
 
-            face_locations = face_recognition.face_locations(image_array, model=self.model)
+            face_locations = self.locate_faces(image)
 
             if not face_locations:
                 return None
 
-            face_encodings = face_recognition.face_encodings(image_array, face_locations)
+            with stage('encoding'):
+                face_encodings = get_face_recognition().face_encodings(np.array(image), face_locations[:1])
 
             if not face_encodings:
                 return None
@@ -68,16 +204,68 @@ class FaceRecognitionService:
             return None
 
 
+    @_offloaded
+    def encode_faces_from_bytes(self, image_bytes):
+
+        if get_face_recognition() is None:
+            print("face_recognition library not installed")
+            return []
+
+        try:
+            image = self.load_image(image_bytes)
+
+            face_locations = self._locate_faces(image, self.group_detection_max_size)
+
+            if not face_locations:
+                return []
+
+            # One call encodes every detected face in the frame
+            with stage('encoding'):
+                return get_face_recognition().face_encodings(np.array(image), face_locations)
+
+        except Exception as e:
+            print(f"Error encoding faces from bytes: {str(e)}")
+            return []
+
+
+    @_offloaded
+    def encode_image(self, image):
+        # Encode the first face of an image that is already decoded
+        if get_face_recognition() is None:
+            print("face_recognition library not installed")
+            return None
+
+        try:
+            face_locations = self.locate_faces(image)
+            face_encodings = self.encode_locations(image, face_locations[:1])
+            if not face_encodings:
+                return None
+            return face_encodings[0].tolist()
+
+        except Exception as e:
+            print(f"Error encoding face: {str(e)}")
+            return None
+
+
+    @_offloaded
+    def encode_locations(self, image, face_locations):
+        # Encode already-located faces, e.g. boxes carried over by a tracker
+        if get_face_recognition() is None or not face_locations:
+            return []
+        with stage('encoding'):
+            return get_face_recognition().face_encodings(np.array(image), face_locations)
+
+
     def compare_faces(self, known_encoding, unknown_encoding):
 
-        if face_recognition is None:
+        if get_face_recognition() is None:
             return False, 0.0
 
         try:
             known = np.array(known_encoding)
             unknown = np.array(unknown_encoding)
 
-            distance = face_recognition.face_distance([known], unknown)[0]
+            distance = get_face_recognition().face_distance([known], unknown)[0]
 
             is_match = distance <= self.tolerance
 
@@ -93,32 +281,56 @@ class FaceRecognitionService:
     def find_matching_student(self, uploaded_encoding, student_encodings):
 
         try:
-            best_match = None
-            best_confidence = 0
+            gallery = student_encodings
+            if not isinstance(gallery, FaceGallery):
+                gallery = FaceGallery.from_dict(student_encodings)
+
+            with stage('matching'):
+                return gallery.best_match(uploaded_encoding, self.tolerance)
+
+        except Exception as e:
+            print(f"Error finding matching student: {str(e)}")
+            return None, 0
+
+
+    def find_top_matches(self, uploaded_encoding, student_encodings, k=5):
+
+        try:
+            gallery = student_encodings
+            if not isinstance(gallery, FaceGallery):
+                gallery = FaceGallery.from_dict(student_encodings)
 
-            for student_id, known_encoding in student_encodings.items():
+            with stage('matching'):
+                return gallery.top_k(uploaded_encoding, k=k, tolerance=self.tolerance)
 
-                is_match, confidence = self.compare_faces(known_encoding, uploaded_encoding)
+        except Exception as e:
+            print(f"Error finding top matches: {str(e)}")
+            return []
 
-                if is_match and confidence > best_confidence:
-                    best_match = student_id
-                    best_confidence = confidence
 
-            return best_match, best_confidence
+    def assign_faces(self, uploaded_encodings, student_encodings):
+
+        try:
+            gallery = student_encodings
+            if not isinstance(gallery, FaceGallery):
+                gallery = FaceGallery.from_dict(student_encodings)
+
+            with stage('matching'):
+                return gallery.assign(uploaded_encodings, self.tolerance)
 
         except Exception as e:
-            print(f"Error finding matching student: {str(e)}")
-            return None, 0
+            print(f"Error assigning faces: {str(e)}")
+            return []
 
 
     def detect_faces_in_image(self, image_path):
 
-        if face_recognition is None:
+        if get_face_recognition() is None:
             return 0
 
         try:
-            image = face_recognition.load_image_file(image_path)
-            face_locations = face_recognition.face_locations(image, model=self.model)
+            image = self.load_image(image_path)
+            face_locations = self.locate_faces(image)
 
             return len(face_locations)
 
@@ -127,25 +339,147 @@ class FaceRecognitionService:
             return 0
 
 
-    def encoding_to_string(self, encoding):
+    def encoding_to_bytes(self, encoding):
+        # One encoding, or several templates of the same student stacked as rows
         if encoding is None:
-            return ""
-        return ",".join(map(str, encoding))
+            return b""
+        dtype = ENCODING_DTYPES[self.storage_format]
+        return bytes([self.storage_format]) + np.asarray(encoding, dtype=dtype).tobytes()
 
 
-    def string_to_encoding(self, encoding_str):
-        if not encoding_str:
+    def bytes_to_encodings(self, encoding_bytes):
+        """Every stored template as a (templates, 128) float32 array."""
+        if not encoding_bytes:
             return None
         try:
-            return [float(x) for x in encoding_str.split(",")]
-        except:
+            dtype = ENCODING_DTYPES[encoding_bytes[0]]
+            encodings = np.frombuffer(encoding_bytes, dtype=dtype, offset=1)
+            if len(encodings) == 0 or len(encodings) % ENCODING_SIZE:
+                return None
+            if dtype != ENCODING_DTYPES[ENCODING_FORMAT_FLOAT32]:
+                encodings = encodings.astype(np.float32)
+            return encodings.reshape(-1, ENCODING_SIZE)
+        except (KeyError, ValueError):
             return None
 
 
+    def bytes_to_encoding(self, encoding_bytes):
+        # The primary template: the one encoded from the student's photo
+        encodings = self.bytes_to_encodings(encoding_bytes)
+        return None if encodings is None else encodings[0]
+
+
 def get_face_service():
     from django.conf import settings
 
     tolerance = getattr(settings, 'FACE_RECOGNITION_TOLERANCE', 0.6)
     model = getattr(settings, 'FACE_RECOGNITION_MODEL', 'hog')
+    storage_format = {
+        'float32': ENCODING_FORMAT_FLOAT32,
+        'float16': ENCODING_FORMAT_FLOAT16,
+    }[getattr(settings, 'FACE_ENCODING_STORAGE', 'float32')]
+
+    detection_max_size = getattr(settings, 'FACE_DETECTION_MAX_SIZE', None)
+    group_detection_max_size = getattr(settings, 'FACE_GROUP_DETECTION_MAX_SIZE', None)
+
+    from .face_pool import get_face_pool
+
+    return FaceRecognitionService(
+        tolerance=tolerance,
+        model=model,
+        storage_format=storage_format,
+        detection_max_size=detection_max_size,
+        group_detection_max_size=group_detection_max_size,
+        pool=get_face_pool(),
+    )
+
+
+# Worker-process side of the encoding job queue. These functions only touch
+# face_recognition and NumPy so they can run in spawned pool processes that
+# never set up Django.
+_job_service = None
+
+
+def encoding_worker_initargs(face_service):
+    """Arguments for init_encoding_worker that give a pool process face_service's settings"""
+    return (
+        face_service.tolerance,
+        face_service.model,
+        face_service.storage_format,
+        face_service.detection_max_size,
+        face_service.group_detection_max_size,
+    )
+
+
+def make_encoding_pool(processes, face_service):
+    """A multiprocessing pool whose processes encode with face_service's settings"""
+    return multiprocessing.Pool(
+        processes,
+        initializer=init_encoding_worker,
+        initargs=encoding_worker_initargs(face_service),
+    )
+
+
+def init_encoding_worker(tolerance, model, storage_format, detection_max_size=None,
+                         group_detection_max_size=None):
+    global _job_service
+    _job_service = FaceRecognitionService(
+        tolerance=tolerance,
+        model=model,
+        storage_format=storage_format,
+        detection_max_size=detection_max_size,
+        group_detection_max_size=group_detection_max_size,
+    )
+
+
+def warm_up_worker():
+    # Submitted once per process when a face pool starts, so none is cold on first use
+    return warm_up()
+
+
+def run_pooled(method_name, *args):
+    """Call a FaceRecognitionService method in a face pool process.
+
+    Returns (result, stage timings), as the stages are timed in this process.
+    """
+    timings, token = start_request_timing()
+    try:
+        return getattr(_job_service, method_name)(*args), timings
+    finally:
+        stop_request_timing(token)
+
+
+def _encode_photo(image_path, single_face_only=False):
+    """Returns (encoding_bytes, error, retryable) for one photo."""
+    if get_face_recognition() is None:
+        return None, "face_recognition library not installed", False
+
+    try:
+        image = _job_service.load_image(image_path)
+        face_locations = _job_service.locate_faces(image)
+
+        if not face_locations:
+            return None, "No face detected", False
+        if single_face_only and len(face_locations) > 1:
+            return None, f"{len(face_locations)} faces detected", False
+
+        face_encodings = get_face_recognition().face_encodings(np.array(image), face_locations[:1])
+        return _job_service.encoding_to_bytes(face_encodings[0]), "", False
+
+    except FileNotFoundError as e:
+        return None, f"Photo not found: {str(e)}", False
+    except Exception as e:
+        return None, str(e), True
+
+
+def encode_photo_job(job):
+    """Encode one queued photo; returns (job_id, encoding_bytes, error, retryable)."""
+    job_id, image_path = job
+    return (job_id,) + _encode_photo(image_path)
+
 
-    return FaceRecognitionService(tolerance=tolerance, model=model)
\ No newline at end of file
+def encode_import_photo(item):
+    """Encode one photo for bulk import, rejecting photos with several faces."""
+    key, image_path = item
+    encoding_bytes, error, _ = _encode_photo(image_path, single_face_only=True)
+    return key, encoding_bytes, error
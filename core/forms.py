@@ -1,6 +1,7 @@
 from django import forms
 from .models import Student, Course, AttendanceSession, Attendance
 from django.core.exceptions import ValidationError
+from .scheduling import WEEKDAY_CHOICES
 
 
 class StudentRegistrationForm(forms.ModelForm):
@@ -99,6 +100,57 @@ class AttendanceSessionForm(forms.ModelForm):
         }
 
 
+class RecurringSessionForm(forms.Form):
+    """Form for generating weekly sessions over a date range"""
+    course = forms.ModelChoiceField(
+        queryset=Course.objects.all(),
+        widget=forms.Select(attrs={
+            'class': 'form-control'
+        })
+    )
+    start_date = forms.DateField(
+        widget=forms.DateInput(attrs={
+            'class': 'form-control',
+            'type': 'date'
+        })
+    )
+    end_date = forms.DateField(
+        widget=forms.DateInput(attrs={
+            'class': 'form-control',
+            'type': 'date'
+        })
+    )
+    weekdays = forms.MultipleChoiceField(
+        choices=WEEKDAY_CHOICES,
+        widget=forms.CheckboxSelectMultiple(attrs={
+            'class': 'form-check-input'
+        })
+    )
+    session_time = forms.TimeField(
+        widget=forms.TimeInput(attrs={
+            'class': 'form-control',
+            'type': 'time'
+        })
+    )
+    session_type = forms.ChoiceField(
+        choices=AttendanceSession._meta.get_field('session_type').choices,
+        widget=forms.Select(attrs={
+            'class': 'form-control'
+        })
+    )
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        start_date = cleaned_data.get('start_date')
+        end_date = cleaned_data.get('end_date')
+        if start_date and end_date:
+            if end_date < start_date:
+                raise ValidationError("End date must be on or after the start date")
+            if (end_date - start_date).days > 366:
+                raise ValidationError("Recurring sessions can span at most one year")
+        return cleaned_data
+
+
 class FaceRecognitionUploadForm(forms.Form):
     """Form for uploading images for face recognition"""
     image = forms.ImageField(
@@ -109,6 +161,13 @@ class FaceRecognitionUploadForm(forms.Form):
         }),
         help_text="Upload a clear image containing student faces"
     )
+    group_photo = forms.BooleanField(
+        required=False,
+        widget=forms.CheckboxInput(attrs={
+            'class': 'form-check-input'
+        }),
+        help_text="Mark every recognized student in a class photo"
+    )
     
     def clean_image(self):
         image = self.cleaned_data.get('image')
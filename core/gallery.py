@@ -0,0 +1,144 @@
+import numpy as np
+
+
+ENCODING_SIZE = 128
+
+
+class FaceGallery:
+    """Known face templates stacked into one contiguous float32 matrix.
+
+    Matching an unknown face against the gallery is a single matrix-vector
+    product instead of one small NumPy call per student. A student may have
+    several templates; their rows are kept adjacent so template distances
+    reduce to one best distance per student with np.minimum.reduceat.
+    """
+
+    def __init__(self, student_ids, encodings):
+        row_student_ids = np.asarray(student_ids, dtype=np.int64)
+        encodings = np.asarray(encodings, dtype=np.float32).reshape(len(row_student_ids), ENCODING_SIZE)
+
+        order = np.argsort(row_student_ids, kind='stable')
+        self.row_student_ids = row_student_ids[order]
+        self.encodings = np.ascontiguousarray(encodings[order])
+        # Squared norms are reused by every query (|a-b|^2 = |a|^2 + |b|^2 - 2ab)
+        self.squared_norms = np.einsum('ij,ij->i', self.encodings, self.encodings)
+
+        self.student_ids, self._starts = np.unique(self.row_student_ids, return_index=True)
+        self._single_template = len(self.student_ids) == len(self.row_student_ids)
+
+    @classmethod
+    def from_dict(cls, student_encodings):
+        """Build from {student_id: encoding}, or {student_id: [template, ...]}"""
+        student_ids = []
+        rows = []
+        for student_id, encodings in student_encodings.items():
+            encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+            student_ids.extend([student_id] * len(encodings))
+            rows.append(encodings)
+        if not rows:
+            return cls([], np.empty((0, ENCODING_SIZE), dtype=np.float32))
+        return cls(student_ids, np.vstack(rows))
+
+    def __len__(self):
+        return len(self.student_ids)
+
+    @property
+    def template_count(self):
+        return len(self.row_student_ids)
+
+    def _per_student(self, row_distances):
+        # Best (smallest) distance over each student's templates, along the last axis
+        if self._single_template:
+            return row_distances
+        return np.minimum.reduceat(row_distances, self._starts, axis=-1)
+
+    def distances(self, encoding):
+        """Best distance to each student (ordered like student_ids)."""
+        query = np.asarray(encoding, dtype=np.float32)
+        squared = self.squared_norms + query.dot(query) - 2.0 * self.encodings.dot(query)
+        return self._per_student(np.sqrt(np.maximum(squared, 0.0)))
+
+    def distance_matrix(self, encodings):
+        """Distances between every query encoding (rows) and every student (columns)."""
+        queries = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+        query_norms = np.einsum('ij,ij->i', queries, queries)
+        squared = query_norms[:, None] + self.squared_norms[None, :] - 2.0 * queries.dot(self.encodings.T)
+        return self._per_student(np.sqrt(np.maximum(squared, 0.0)))
+
+    def best_match(self, encoding, tolerance):
+        """Return (student_id, confidence) of the closest match within tolerance."""
+        if not len(self):
+            return None, 0
+
+        distances = self.distances(encoding)
+        row = int(np.argmin(distances))
+        distance = float(distances[row])
+
+        if distance > tolerance:
+            return None, 0
+
+        return int(self.student_ids[row]), round((1 - distance) * 100, 2)
+
+    def top_k(self, encoding, k=5, tolerance=None):
+        """Return up to k (student_id, distance) pairs, closest first."""
+        if not len(self) or k <= 0:
+            return []
+
+        distances = self.distances(encoding)
+        k = min(k, len(distances))
+        rows = np.argpartition(distances, k - 1)[:k]
+        rows = rows[np.argsort(distances[rows], kind='stable')]
+
+        matches = []
+        for row in rows:
+            distance = float(distances[row])
+            if tolerance is not None and distance > tolerance:
+                break
+            matches.append((int(self.student_ids[row]), distance))
+        return matches
+
+    def assign(self, encodings, tolerance):
+        """Match several faces to distinct students, closest pairs first.
+
+        Returns (face_index, student_id, confidence) tuples for every face that
+        found a student within tolerance, ordered by face index.
+        """
+        if not len(self) or not len(encodings):
+            return []
+
+        distances = self.distance_matrix(encodings)
+        faces, rows = np.nonzero(distances <= tolerance)
+        order = np.argsort(distances[faces, rows], kind='stable')
+
+        used_faces = set()
+        used_rows = set()
+        assignments = []
+        for index in order:
+            face, row = int(faces[index]), int(rows[index])
+            if face in used_faces or row in used_rows:
+                continue
+            used_faces.add(face)
+            used_rows.add(row)
+            confidence = round((1 - float(distances[face, row])) * 100, 2)
+            assignments.append((face, int(self.student_ids[row]), confidence))
+
+        return sorted(assignments)
+
+    def with_student(self, student_id, encodings):
+        """Return a copy of the gallery with one student's templates added or replaced."""
+        gallery = self.without_student(student_id)
+        encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+        return FaceGallery(
+            np.append(gallery.row_student_ids, [student_id] * len(encodings)),
+            np.vstack([gallery.encodings, encodings]),
+        )
+
+    def without_student(self, student_id):
+        """Return a copy of the gallery without the given student."""
+        keep = self.row_student_ids != student_id
+        if keep.all():
+            return self
+        return FaceGallery(self.row_student_ids[keep], self.encodings[keep])
+
+    def __contains__(self, student_id):
+        return bool((self.student_ids == student_id).any())
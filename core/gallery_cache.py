@@ -0,0 +1,157 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from .face_recognition_utils import get_face_service
+from .gallery import FaceGallery, ENCODING_SIZE
+from .metrics import stage
+
+
+# Shared-cache key changed by every process that changes a student's encoding
+SHARED_GENERATION_KEY = 'gallery:generation'
+
+
+class CourseGalleryCache:
+    """Process-wide LRU cache of parsed face galleries, keyed by course id.
+
+    A process that changes a student (a web worker, encoding_worker or a
+    management command) sets a new token under SHARED_GENERATION_KEY in
+    the shared cache; the others see it on their next get() and reload.
+    """
+
+    def __init__(self, max_courses=None):
+        self._max_courses = max_courses
+        self._galleries = OrderedDict()
+        self._loaded_at = {}
+        # SHARED_GENERATION_KEY token each gallery was loaded under
+        self._tokens = {}
+        self._lock = threading.Lock()
+        # Bumped on every mutation so a load racing a signal is not cached stale
+        self._generation = 0
+
+    @property
+    def max_courses(self):
+        if self._max_courses is None:
+            return getattr(settings, 'FACE_GALLERY_CACHE_SIZE', 32)
+        return self._max_courses
+
+    @property
+    def ttl(self):
+        # A safety net for writes that bypass signals (queryset.update(), the shell)
+        return getattr(settings, 'FACE_GALLERY_CACHE_TTL', 300)
+
+    def get(self, course_id):
+        token = cache.get(SHARED_GENERATION_KEY)
+        with self._lock:
+            gallery = self._galleries.get(course_id)
+            fresh = gallery is not None and self._tokens[course_id] == token and (
+                not self.ttl or time.monotonic() - self._loaded_at[course_id] < self.ttl
+            )
+            if fresh:
+                self._galleries.move_to_end(course_id)
+                return gallery
+            generation = self._generation
+
+        gallery = self._load(course_id)
+
+        with self._lock:
+            if generation != self._generation:
+                return gallery
+            self._galleries[course_id] = gallery
+            self._galleries.move_to_end(course_id)
+            self._loaded_at[course_id] = time.monotonic()
+            self._tokens[course_id] = token
+            while len(self._galleries) > self.max_courses:
+                evicted, _ = self._galleries.popitem(last=False)
+                self._loaded_at.pop(evicted, None)
+                self._tokens.pop(evicted, None)
+        return gallery
+
+    def invalidate(self, course_id=None):
+        self._publish()
+        with self._lock:
+            self._generation += 1
+            if course_id is None:
+                self._galleries.clear()
+                self._loaded_at.clear()
+                self._tokens.clear()
+            else:
+                self._galleries.pop(course_id, None)
+                self._loaded_at.pop(course_id, None)
+                self._tokens.pop(course_id, None)
+
+    def _publish(self):
+        """Tell other processes to reload; returns (previous token, new token)"""
+        # A fresh random token rather than a counter, so concurrent writers never
+        # read the same value and write back the same next one
+        previous = cache.get(SHARED_GENERATION_KEY)
+        token = uuid.uuid4().hex
+        cache.set(SHARED_GENERATION_KEY, token, None)
+        return previous, token
+
+    def _patched(self, course_id, previous, token):
+        # This process patched the gallery itself, so it need not reload it
+        if self._tokens.get(course_id) == previous:
+            self._tokens[course_id] = token
+
+    def update_student(self, student):
+        """Patch cached galleries after a student was saved."""
+        encodings = None
+        if student.is_active and student.has_current_encoding:
+            encodings = get_face_service().bytes_to_encodings(student.face_encoding)
+
+        previous, token = self._publish()
+        with self._lock:
+            self._generation += 1
+            for course_id, gallery in list(self._galleries.items()):
+                if course_id == student.course_id and encodings is not None:
+                    self._galleries[course_id] = gallery.with_student(student.pk, encodings)
+                elif student.pk in gallery:
+                    self._galleries[course_id] = gallery.without_student(student.pk)
+                self._patched(course_id, previous, token)
+
+    def remove_student(self, student_id):
+        previous, token = self._publish()
+        with self._lock:
+            self._generation += 1
+            for course_id, gallery in list(self._galleries.items()):
+                if student_id in gallery:
+                    self._galleries[course_id] = gallery.without_student(student_id)
+                self._patched(course_id, previous, token)
+
+    def _load(self, course_id):
+        from .models import Student
+
+        face_service = get_face_service()
+        # Encodings from another model version are not comparable; those
+        # students stay out until manage.py reencode_faces has reached them
+        rows = Student.objects.filter(
+            course_id=course_id,
+            is_active=True,
+            encoding_version=face_service.encoding_version
+        ).exclude(face_encoding=b'').values_list('id', 'face_encoding')
+
+        student_ids = []
+        encodings = []
+        for student_id, face_encoding in rows:
+            templates = face_service.bytes_to_encodings(face_encoding)
+            if templates is not None:
+                student_ids.extend([student_id] * len(templates))
+                encodings.append(templates)
+
+        if not encodings:
+            return FaceGallery([], np.empty((0, ENCODING_SIZE), dtype=np.float32))
+        return FaceGallery(student_ids, np.vstack(encodings))
+
+
+gallery_cache = CourseGalleryCache()
+
+
+def get_course_gallery(course_id):
+    with stage('gallery_load'):
+        return gallery_cache.get(course_id)
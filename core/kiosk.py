@@ -0,0 +1,148 @@
+"""Streaming kiosk mode: a raw ASGI WebSocket endpoint at /ws/kiosk/<session_id>/.
+
+The browser streams JPEG frames as binary messages. Only the newest frame is
+kept while the server is busy, so a slow server drops frames instead of
+building a backlog. Faces are tracked across frames and only newly appearing
+faces are encoded and matched; every processed frame is answered with a JSON
+text message describing the tracked faces.
+"""
+import asyncio
+import json
+import re
+
+from asgiref.sync import sync_to_async
+
+from .face_pool import FacePoolBusy
+from .face_recognition_utils import get_face_service
+from .gallery_cache import get_course_gallery
+from .marking import mark_face_attendance
+from .models import AttendanceSession, Student
+from .tracking import FaceTracker
+
+
+KIOSK_PATH = re.compile(r'^/ws/kiosk/(?P<session_id>\d+)/$')
+MAX_FRAME_BYTES = 10 * 1024 * 1024
+
+
+class KioskStream:
+
+    def __init__(self, session):
+        self.session = session
+        self.face_service = get_face_service()
+        self.tracker = FaceTracker()
+        self.student_names = {}
+        self.latest_frame = None
+        self.frame_ready = asyncio.Event()
+        self.received = 0
+        self.dropped = 0
+
+    def push(self, frame):
+        self.received += 1
+        if self.latest_frame is not None:
+            # The previous frame was never picked up; the newer one replaces it
+            self.dropped += 1
+        self.latest_frame = frame
+        self.frame_ready.set()
+
+    async def run(self, send):
+        process = sync_to_async(self.process_frame, thread_sensitive=False)
+        while True:
+            await self.frame_ready.wait()
+            self.frame_ready.clear()
+            frame, self.latest_frame = self.latest_frame, None
+            if frame is None:
+                continue
+
+            try:
+                result = await process(frame)
+            except FacePoolBusy as e:
+                result = {'error': str(e), 'retry_after': e.retry_after}
+            except Exception as e:
+                result = {'error': f'Error processing frame: {str(e)}'}
+
+            result['received'] = self.received
+            result['dropped'] = self.dropped
+            await send({'type': 'websocket.send', 'text': json.dumps(result)})
+
+    def process_frame(self, frame):
+        image = self.face_service.load_image(frame)
+        boxes = self.face_service.locate_faces(image)
+        new_tracks = self.tracker.update(boxes)
+
+        events = []
+        if new_tracks:
+            encodings = self.face_service.encode_locations(image, [track.box for track in new_tracks])
+            gallery = get_course_gallery(self.session.course_id)
+
+            for track, encoding in zip(new_tracks, encodings):
+                track.attempts += 1
+                student_id, confidence = self.face_service.find_matching_student(encoding, gallery)
+                if not student_id:
+                    continue
+
+                status, name = mark_face_attendance(self.session, student_id, confidence, frame)
+                if name is not None:
+                    self.student_names[student_id] = name
+                track.student_id = student_id
+                track.confidence = confidence
+                track.status = status
+                events.append({
+                    'track_id': track.track_id,
+                    'student_id': student_id,
+                    'name': self._student_name(student_id),
+                    'status': status,
+                    'confidence': confidence,
+                })
+
+        return {
+            'faces': [
+                {
+                    'track_id': track.track_id,
+                    'box': list(track.box),
+                    'student_id': track.student_id,
+                    'name': self.student_names.get(track.student_id),
+                    'status': track.status,
+                }
+                for track in self.tracker.tracks
+                if track.last_frame == self.tracker.frame
+            ],
+            'events': events,
+        }
+
+    def _student_name(self, student_id):
+        if student_id not in self.student_names:
+            self.student_names[student_id] = Student.objects.values_list(
+                'name', flat=True
+            ).get(pk=student_id)
+        return self.student_names[student_id]
+
+
+async def kiosk_websocket(scope, receive, send):
+    message = await receive()
+    if message['type'] != 'websocket.connect':
+        return
+
+    match = KIOSK_PATH.match(scope['path'])
+    session = None
+    if match:
+        session = await sync_to_async(
+            AttendanceSession.objects.select_related('course').filter(pk=match['session_id']).first
+        )()
+    if session is None:
+        await send({'type': 'websocket.close', 'code': 4404})
+        return
+
+    await send({'type': 'websocket.accept'})
+    stream = KioskStream(session)
+    worker = asyncio.ensure_future(stream.run(send))
+
+    try:
+        while True:
+            message = await receive()
+            if message['type'] == 'websocket.disconnect':
+                break
+            frame = message.get('bytes')
+            if frame and len(frame) <= MAX_FRAME_BYTES:
+                stream.push(frame)
+    finally:
+        worker.cancel()
@@ -0,0 +1,88 @@
+import glob
+import os
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import face_recognition_utils
+from core.face_recognition_utils import FaceRecognitionService, get_face_service
+
+
+class Command(BaseCommand):
+    help = 'Measure detection+encoding latency and accuracy across detection resolutions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('images', nargs='*',
+                            help='Images to test (default: all student photos in MEDIA_ROOT)')
+        parser.add_argument('--sizes', nargs='+', type=int, default=[0, 1280, 960, 640, 480, 320],
+                            help='Longest side used for detection; 0 means full resolution')
+        parser.add_argument('--repeat', type=int, default=3)
+        parser.add_argument('--group', action='store_true',
+                            help='Treat the images as group photos and count every face found, '
+                                 'against those found at full resolution (for FACE_GROUP_DETECTION_MAX_SIZE)')
+
+    def handle(self, *args, **options):
+        if face_recognition_utils.get_face_recognition() is None:
+            raise CommandError('face_recognition library not installed')
+
+        images = options['images'] or sorted(glob.glob(os.path.join(settings.MEDIA_ROOT, 'student_photos', '*')))
+        if not images:
+            raise CommandError('No images to benchmark')
+
+        model = get_face_service().model
+        reference = FaceRecognitionService(model=model)
+        decoded = [reference.load_image(path) for path in images]
+        baseline = [reference.encode_face(path) for path in images]
+
+        if options['group']:
+            self._benchmark_group(reference, decoded, options)
+            return
+
+        self.stdout.write(f'{len(images)} images, model={model}')
+        self.stdout.write(f"{'max size':>9} {'ms/image':>9} {'faces found':>12} {'max drift':>10}")
+
+        for size in options['sizes']:
+            service = FaceRecognitionService(model=model, detection_max_size=size or None)
+            timings = []
+            found = 0
+            drift = 0.0
+            for image, expected in zip(decoded, baseline):
+                for _ in range(options['repeat']):
+                    start = time.perf_counter()
+                    locations = service.locate_faces(image)
+                    encodings = face_recognition_utils.get_face_recognition().face_encodings(
+                        np.array(image), locations[:1]
+                    )
+                    timings.append(time.perf_counter() - start)
+                if encodings:
+                    found += 1
+                    if expected is not None:
+                        # Distance from the full-resolution encoding of the same photo
+                        drift = max(drift, float(np.linalg.norm(np.asarray(expected) - encodings[0])))
+
+            label = 'full' if not size else str(size)
+            self.stdout.write(
+                f'{label:>9} {np.mean(timings) * 1000:>9.1f} {found:>6}/{len(images):<5} {drift:>10.3f}'
+            )
+
+    def _benchmark_group(self, reference, decoded, options):
+        expected = sum(len(reference.locate_faces(image)) for image in decoded)
+        self.stdout.write(f'{len(decoded)} group photos, {expected} faces at full resolution, model={reference.model}')
+        self.stdout.write(f"{'max size':>9} {'ms/image':>9} {'faces found':>12}")
+
+        for size in options['sizes']:
+            service = FaceRecognitionService(model=reference.model, detection_max_size=size or None)
+            timings = []
+            found = 0
+            for image in decoded:
+                for _ in range(options['repeat']):
+                    start = time.perf_counter()
+                    locations = service.locate_faces(image)
+                    face_recognition_utils.get_face_recognition().face_encodings(np.array(image), locations)
+                    timings.append(time.perf_counter() - start)
+                found += len(locations)
+
+            label = 'full' if not size else str(size)
+            self.stdout.write(f'{label:>9} {np.mean(timings) * 1000:>9.1f} {found:>6}/{expected:<5}')
@@ -0,0 +1,61 @@
+import os
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from core.face_recognition_utils import (
+    FaceRecognitionService, ENCODING_FORMAT_FLOAT32, ENCODING_FORMAT_FLOAT16
+)
+
+
+class Command(BaseCommand):
+    help = 'Compare database size and load time of text and binary face encodings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=10000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        encodings = rng.normal(0, 0.1, (options['students'], 128))
+
+        float32_service = FaceRecognitionService(storage_format=ENCODING_FORMAT_FLOAT32)
+        float16_service = FaceRecognitionService(storage_format=ENCODING_FORMAT_FLOAT16)
+
+        formats = [
+            ('text', lambda e: ','.join(map(str, e.tolist())), self._parse_text),
+            ('float32', float32_service.encoding_to_bytes, float32_service.bytes_to_encoding),
+            ('float16', float16_service.encoding_to_bytes, float16_service.bytes_to_encoding),
+        ]
+
+        self.stdout.write(f"{'format':>8} {'db size KB':>12} {'bytes/row':>10} {'load+parse ms':>14}")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            for name, encode, decode in formats:
+                path = os.path.join(tmp, f'{name}.sqlite3')
+                connection = sqlite3.connect(path)
+                connection.execute('CREATE TABLE student (id INTEGER PRIMARY KEY, face_encoding BLOB)')
+                connection.executemany(
+                    'INSERT INTO student (face_encoding) VALUES (?)',
+                    ((encode(e),) for e in encodings)
+                )
+                connection.commit()
+                connection.execute('VACUUM')
+                row_bytes = connection.execute('SELECT AVG(LENGTH(face_encoding)) FROM student').fetchone()[0]
+
+                start = time.perf_counter()
+                rows = connection.execute('SELECT id, face_encoding FROM student').fetchall()
+                parsed = [decode(blob) for _, blob in rows]
+                load_ms = (time.perf_counter() - start) * 1000
+                connection.close()
+
+                assert len(parsed) == len(encodings)
+                size_kb = os.path.getsize(path) / 1024
+                self.stdout.write(f'{name:>8} {size_kb:>12.0f} {row_bytes:>10.0f} {load_ms:>14.1f}')
+
+    def _parse_text(self, encoding_str):
+        # The comma-separated format used before migration 0002
+        return [float(x) for x in encoding_str.split(',')]
@@ -0,0 +1,51 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from core.face_index import IVFIndex
+from core.gallery import FaceGallery
+
+
+class Command(BaseCommand):
+    help = 'Measure recall and latency of the IVF face index against brute force'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=50000)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--n-probe', type=int, nargs='+', default=[1, 4, 8, 16, 32])
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        n_students = options['students']
+
+        # Real encodings are clustered (by demographics, pose, lighting), so draw
+        # students around a set of group centres rather than uniformly.
+        centres = rng.normal(0, 0.15, (256, 128))
+        encodings = (centres[rng.integers(0, len(centres), n_students)]
+                     + rng.normal(0, 0.06, (n_students, 128))).astype(np.float32)
+        student_ids = np.arange(1, n_students + 1)
+        targets = rng.integers(0, n_students, options['queries'])
+        queries = encodings[targets] + rng.normal(0, 0.02, (len(targets), 128)).astype(np.float32)
+
+        gallery = FaceGallery(student_ids, encodings)
+        start = time.perf_counter()
+        truth = [gallery.top_k(query, k=1)[0][0] for query in queries]
+        brute_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+        start = time.perf_counter()
+        index = IVFIndex()
+        index.train(student_ids, encodings)
+        train_s = time.perf_counter() - start
+
+        self.stdout.write(f'{n_students} students, {len(index.centroids)} lists, trained in {train_s:.1f}s')
+        self.stdout.write(f'brute force: {brute_ms:.3f} ms/query')
+        self.stdout.write(f"{'n_probe':>8} {'recall@1':>9} {'ms/query':>9} {'speedup':>8}")
+
+        for n_probe in options['n_probe']:
+            start = time.perf_counter()
+            results = [index.search(query, k=1, n_probe=n_probe) for query in queries]
+            ivf_ms = (time.perf_counter() - start) * 1000 / len(queries)
+            recall = np.mean([bool(r) and r[0][0] == t for r, t in zip(results, truth)])
+            self.stdout.write(f'{n_probe:>8} {recall:>9.3f} {ivf_ms:>9.3f} {brute_ms / ivf_ms:>7.1f}x')
@@ -0,0 +1,61 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from core.gallery import FaceGallery
+
+
+class Command(BaseCommand):
+    help = 'Compare per-student matching against the vectorized FaceGallery'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[100, 1000, 10000])
+        parser.add_argument('--queries', type=int, default=50)
+        parser.add_argument('--tolerance', type=float, default=0.6)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        tolerance = options['tolerance']
+
+        self.stdout.write(f"{'students':>10} {'loop ms':>10} {'gallery ms':>12} {'speedup':>9}")
+
+        for size in options['sizes']:
+            student_encodings = {
+                student_id: rng.normal(0, 0.1, 128).tolist()
+                for student_id in range(1, size + 1)
+            }
+            known_ids = rng.integers(1, size + 1, options['queries'])
+            queries = [
+                np.asarray(student_encodings[int(student_id)]) + rng.normal(0, 0.01, 128)
+                for student_id in known_ids
+            ]
+
+            start = time.perf_counter()
+            loop_results = [self._loop_match(q, student_encodings, tolerance) for q in queries]
+            loop_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+            gallery = FaceGallery.from_dict(student_encodings)
+            start = time.perf_counter()
+            gallery_results = [gallery.best_match(q, tolerance) for q in queries]
+            gallery_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+            if [r[0] for r in loop_results] != [r[0] for r in gallery_results]:
+                self.stderr.write(self.style.ERROR(f'Result mismatch at {size} students'))
+
+            self.stdout.write(
+                f'{size:>10} {loop_ms:>10.3f} {gallery_ms:>12.3f} {loop_ms / gallery_ms:>8.1f}x'
+            )
+
+    def _loop_match(self, uploaded_encoding, student_encodings, tolerance):
+        # Mirrors the original per-student compare_faces loop
+        best_match = None
+        best_confidence = 0
+        for student_id, known_encoding in student_encodings.items():
+            distance = np.linalg.norm(np.array([known_encoding]) - np.array(uploaded_encoding), axis=1)[0]
+            confidence = round((1 - distance) * 100, 2)
+            if distance <= tolerance and confidence > best_confidence:
+                best_match = student_id
+                best_confidence = confidence
+        return best_match, best_confidence
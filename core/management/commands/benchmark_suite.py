@@ -0,0 +1,193 @@
+import json
+import os
+import platform
+import subprocess
+import time
+from datetime import date, timedelta
+
+import django
+import numpy as np
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+
+from core.face_recognition_utils import get_face_service
+from core.gallery_cache import gallery_cache
+from core.models import Course, Student
+from core.management.throwaway_db import throwaway_database
+from core.summary import invalidate_summary
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the recognition pipeline and the heaviest pages against '
+        'synthetic data at several scales. Runs in a throwaway test database; '
+        'write results with --output and compare releases with --compare.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', nargs='+', type=int, default=[1000, 5000],
+                            help='Total number of students for each run')
+        parser.add_argument('--courses', type=int, default=10)
+        parser.add_argument('--sessions', type=int, default=40, help='Past sessions per course')
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Write results as JSON to this file')
+        parser.add_argument('--compare', help='JSON results of an earlier run to compare against')
+
+    def handle(self, *args, **options):
+        baseline = self._read_baseline(options['compare']) if options['compare'] else None
+        results = []
+
+        with throwaway_database('benchmark.sqlite3'):
+            setup_test_environment()
+            try:
+                for scale in options['scales']:
+                    call_command(
+                        'seed_synthetic',
+                        students=scale,
+                        courses=options['courses'],
+                        sessions=options['sessions'],
+                        seed=options['seed'],
+                        clear=True,
+                        stdout=self.stdout,
+                    )
+                    results += self._run_scale(scale, options)
+            finally:
+                teardown_test_environment()
+
+        self._print_results(results, baseline)
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump({'meta': self._metadata(options), 'results': results}, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Results written to {options["output"]}'))
+
+    def _run_scale(self, scale, options):
+        rng = np.random.default_rng(options['seed'])
+        repeat = options['repeat']
+        face_service = get_face_service()
+        client = Client()
+
+        course = Course.objects.filter(students__isnull=False).order_by('id').first()
+        rows = list(Student.objects.filter(course=course).values_list('id', 'face_encoding'))
+        encodings = [face_service.bytes_to_encoding(blob) for _, blob in rows]
+        queries = [
+            np.asarray(encodings[i]) + rng.normal(0, 0.01, 128)
+            for i in rng.integers(0, len(encodings), repeat)
+        ]
+
+        def load_gallery():
+            gallery_cache.invalidate(course.id)
+            return gallery_cache.get(course.id)
+
+        gallery = load_gallery()
+        queries = iter(queries * 2)
+        blobs = iter([blob for _, blob in rows] * (repeat + 1))
+
+        session_dates = iter(date.today() + timedelta(days=day) for day in range(1, 2 * repeat + 2))
+
+        def create_session():
+            response = client.post(reverse('session_create'), {
+                'course': course.id,
+                'session_date': next(session_dates).isoformat(),
+                'session_time': timezone.now().strftime('%H:%M'),
+                'session_type': 'lecture',
+            })
+            if response.status_code != 302:
+                raise CommandError(f'session_create returned {response.status_code}')
+
+        def get_dashboard():
+            # Measures the queries behind the dashboard; dashboard_cached measures a cache hit
+            invalidate_summary()
+            get_page(reverse('dashboard'))()
+
+        def get_page(url, params=None):
+            def fetch():
+                response = client.get(url, params or {})
+                if response.status_code != 200:
+                    raise CommandError(f'{url} returned {response.status_code}')
+            return fetch
+
+        benchmarks = [
+            ('bytes_to_encoding', lambda: face_service.bytes_to_encoding(next(blobs))),
+            ('gallery_load', load_gallery),
+            ('find_matching_student', lambda: face_service.find_matching_student(next(queries), gallery)),
+            ('session_create', create_session),
+            ('attendance_report', get_page(reverse('attendance_report'))),
+            ('attendance_report_course', get_page(reverse('attendance_report'), {'course': course.id})),
+            ('dashboard', get_dashboard),
+            ('dashboard_cached', get_page(reverse('dashboard'))),
+        ]
+
+        results = []
+        for name, benchmark in benchmarks:
+            results.append({'benchmark': name, 'scale': scale, **self._time(benchmark, repeat)})
+        return results
+
+    def _time(self, benchmark, repeat):
+        benchmark()  # warm-up: imports, template compilation, caches
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            benchmark()
+            timings.append((time.perf_counter() - start) * 1000)
+        timings = np.array(timings)
+        return {
+            'iterations': repeat,
+            'mean_ms': round(float(timings.mean()), 4),
+            'median_ms': round(float(np.median(timings)), 4),
+            'p95_ms': round(float(np.percentile(timings, 95)), 4),
+            'min_ms': round(float(timings.min()), 4),
+            'max_ms': round(float(timings.max()), 4),
+        }
+
+    def _print_results(self, results, baseline):
+        header = f"{'benchmark':<26} {'scale':>7} {'median ms':>11} {'p95 ms':>10}"
+        if baseline:
+            header += f" {'baseline':>10} {'change':>8}"
+        self.stdout.write(header)
+
+        for result in results:
+            line = (
+                f"{result['benchmark']:<26} {result['scale']:>7} "
+                f"{result['median_ms']:>11.3f} {result['p95_ms']:>10.3f}"
+            )
+            previous = baseline.get((result['benchmark'], result['scale'])) if baseline else None
+            if previous:
+                change = (result['median_ms'] - previous['median_ms']) / previous['median_ms'] * 100
+                line += f" {previous['median_ms']:>10.3f} {change:>+7.1f}%"
+            self.stdout.write(line)
+
+    def _read_baseline(self, path):
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Cannot read baseline {path}: {e}')
+        return {(result['benchmark'], result['scale']): result for result in data['results']}
+
+    def _metadata(self, options):
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+        return {
+            'created_at': timezone.now().isoformat(),
+            'commit': commit,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'database': connection.vendor,
+            'courses': options['courses'],
+            'sessions_per_course': options['sessions'],
+            'repeat': options['repeat'],
+            'seed': options['seed'],
+        }
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from core.face_index import student_index
+
+
+class Command(BaseCommand):
+    help = 'Retrain and save the institution-wide face index from all active students'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--if-outdated', action='store_true',
+                            help='Only build when there is no trained index for the current encoding version')
+
+    def handle(self, *args, **options):
+        if options['if_outdated'] and student_index.is_trained():
+            self.stdout.write(f'Face index is up to date -> {student_index.path}')
+            return
+        index = student_index.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {len(index)} students in {len(index.centroids)} lists -> {student_index.path}'
+        ))
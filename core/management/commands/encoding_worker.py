@@ -0,0 +1,68 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.encoding_jobs import claim_jobs, complete_job, fail_job, reclaim_stale_jobs
+from core.face_recognition_utils import get_face_service, make_encoding_pool, encode_photo_job
+
+
+class Command(BaseCommand):
+    help = 'Process queued face encoding jobs on a multiprocessing pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Jobs claimed per round (default: 4 per process)')
+        parser.add_argument('--poll-interval', type=float, default=2.0)
+        parser.add_argument('--stale-after', type=int, default=600,
+                            help='Seconds before a running job is assumed abandoned')
+        parser.add_argument('--once', action='store_true', help='Exit when the queue is empty')
+
+    def handle(self, *args, **options):
+        face_service = get_face_service()
+        batch_size = options['batch_size'] or options['processes'] * 4
+
+        reclaimed = reclaim_stale_jobs(options['stale_after'])
+        if reclaimed:
+            self.stdout.write(f'Requeued {reclaimed} abandoned jobs')
+
+        self.stdout.write(f"Encoding worker started with {options['processes']} processes")
+
+        with make_encoding_pool(options['processes'], face_service) as pool:
+            while True:
+                jobs = claim_jobs(batch_size)
+                if not jobs:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    reclaim_stale_jobs(options['stale_after'])
+                    continue
+
+                self._run_batch(pool, jobs)
+
+    def _run_batch(self, pool, jobs):
+        jobs_by_id = {}
+        work = []
+        for job in jobs:
+            if not job.student.photo:
+                fail_job(job, 'Student has no photo', retryable=False)
+                continue
+            jobs_by_id[job.id] = job
+            work.append((job.id, job.student.photo.path))
+
+        start = time.perf_counter()
+        for job_id, encoding_bytes, error, retryable in pool.imap_unordered(encode_photo_job, work):
+            job = jobs_by_id[job_id]
+            if encoding_bytes:
+                if complete_job(job, encoding_bytes):
+                    self.stdout.write(self.style.SUCCESS(f'Encoded {job.student.name}'))
+                else:
+                    self.stdout.write(self.style.WARNING(f'{job.student.name}: {job.error}'))
+            else:
+                fail_job(job, error, retryable=retryable)
+                self.stdout.write(self.style.WARNING(f'{job.student.name}: {error}'))
+
+        elapsed = time.perf_counter() - start
+        if work:
+            self.stdout.write(f'Batch of {len(work)} photos in {elapsed:.1f}s ({len(work) / elapsed:.1f} photos/sec)')
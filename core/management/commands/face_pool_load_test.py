@@ -0,0 +1,159 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import numpy as np
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from PIL import Image
+
+from core import face_recognition_utils
+from core.face_pool import start_face_pool, stop_face_pool
+from core.management.throwaway_db import throwaway_database
+
+
+class Command(BaseCommand):
+    help = (
+        'Load test the face pool: keep recognition requests saturating it while '
+        'timing dashboard requests served by the same web threads. Runs in a '
+        'throwaway test database; compare with --no-pool to see the difference.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8,
+                            help='Web threads serving requests, like gunicorn --threads')
+        parser.add_argument('--clients', type=int, default=16,
+                            help='Concurrent recognition clients')
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds of load')
+        parser.add_argument('--probe-interval', type=float, default=0.2,
+                            help='Seconds between dashboard requests')
+        parser.add_argument('--students', type=int, default=500)
+        parser.add_argument('--image', help='Photo to recognize (default: a generated image)')
+        parser.add_argument('--no-pool', action='store_true',
+                            help='Encode in the request threads, as without the face pool')
+
+    def handle(self, *args, **options):
+        if face_recognition_utils.get_face_recognition() is None:
+            self.stdout.write(self.style.WARNING(
+                'face_recognition is not installed: recognition requests return at once '
+                'and will not load the pool.'
+            ))
+        if not options['no_pool'] and not getattr(settings, 'FACE_POOL_WORKERS', 0):
+            raise CommandError('FACE_POOL_WORKERS is 0; set it or pass --no-pool')
+
+        image_bytes = self._read_image(options['image'])
+
+        with throwaway_database('load_test.sqlite3'):
+            setup_test_environment()
+            # Every refused request would otherwise log a 'Too Many Requests' warning
+            request_logger = logging.getLogger('django.request')
+            old_level = request_logger.level
+            request_logger.setLevel(logging.ERROR)
+            try:
+                call_command('seed_synthetic', students=options['students'], courses=5,
+                             sessions=10, stdout=self.stdout)
+                if not options['no_pool']:
+                    start = time.perf_counter()
+                    pool = start_face_pool()
+                    self.stdout.write(
+                        f'Face pool: {pool.workers} processes, queue depth {pool.queue_depth}, '
+                        f'warmed up in {time.perf_counter() - start:.1f}s'
+                    )
+                self._run(image_bytes, options)
+            finally:
+                stop_face_pool()
+                request_logger.setLevel(old_level)
+                teardown_test_environment()
+
+    def _read_image(self, path):
+        if path:
+            try:
+                with open(path, 'rb') as f:
+                    return f.read()
+            except OSError as e:
+                raise CommandError(f'Cannot read {path}: {e}')
+        rng = np.random.default_rng(0)
+        output = BytesIO()
+        Image.fromarray(rng.integers(0, 256, (480, 640, 3), dtype=np.uint8)).save(output, format='JPEG')
+        return output.getvalue()
+
+    def _run(self, image_bytes, options):
+        local = threading.local()
+        dashboard_url = reverse('dashboard')
+        recognize_url = reverse('recognize_face')
+
+        def serve(method, path, **kwargs):
+            # Runs on a web thread; the timing includes waiting for a free thread
+            if not hasattr(local, 'client'):
+                local.client = Client()
+            response = getattr(local.client, method)(path, **kwargs)
+            return response.status_code, response.get('Retry-After')
+
+        def timed(server, method, path, **kwargs):
+            start = time.perf_counter()
+            status, retry_after = server.submit(serve, method, path, **kwargs).result()
+            return status, retry_after, (time.perf_counter() - start) * 1000
+
+        def probe(server, until):
+            latencies = []
+            while time.monotonic() < until:
+                status, _, elapsed = timed(server, 'get', dashboard_url)
+                if status != 200:
+                    raise CommandError(f'dashboard returned {status}')
+                latencies.append(elapsed)
+                time.sleep(options['probe_interval'])
+            return latencies
+
+        with ThreadPoolExecutor(options['threads']) as server:
+            timed(server, 'get', dashboard_url)  # warm-up: templates, caches
+            idle = probe(server, time.monotonic() + min(options['duration'] / 2, 5))
+
+            stop = threading.Event()
+            recognitions = []
+            recognitions_lock = threading.Lock()
+
+            def recognition_client():
+                while not stop.is_set():
+                    status, retry_after, elapsed = timed(
+                        server, 'post', recognize_url, data=image_bytes, content_type='image/jpeg'
+                    )
+                    with recognitions_lock:
+                        recognitions.append((status, elapsed))
+                    if status == 429:
+                        # Retry sooner than asked so the pool stays saturated
+                        time.sleep(min(float(retry_after or 1), 0.05))
+
+            clients = [threading.Thread(target=recognition_client) for _ in range(options['clients'])]
+            for client in clients:
+                client.start()
+            try:
+                loaded = probe(server, time.monotonic() + options['duration'])
+            finally:
+                stop.set()
+                for client in clients:
+                    client.join()
+
+        self._report(idle, loaded, recognitions, options['duration'])
+
+    def _report(self, idle, loaded, recognitions, duration):
+        self.stdout.write(f"{'dashboard':<22} {'requests':>9} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9}")
+        for label, latencies in [('idle', idle), ('under recognition load', loaded)]:
+            latencies = np.array(latencies)
+            self.stdout.write(
+                f'{label:<22} {len(latencies):>9} {np.median(latencies):>9.1f} '
+                f'{np.percentile(latencies, 95):>9.1f} {latencies.max():>9.1f}'
+            )
+
+        self.stdout.write(f"{'recognition status':<22} {'requests':>9} {'p50 ms':>9} {'p95 ms':>9} {'per sec':>9}")
+        for status in sorted({status for status, _ in recognitions}):
+            latencies = np.array([elapsed for s, elapsed in recognitions if s == status])
+            self.stdout.write(
+                f'{status:<22} {len(latencies):>9} {np.median(latencies):>9.1f} '
+                f'{np.percentile(latencies, 95):>9.1f} {len(latencies) / duration:>9.1f}'
+            )
@@ -0,0 +1,157 @@
+import csv
+import os
+import time
+
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.face_index import student_index
+from core.face_recognition_utils import get_face_service, make_encoding_pool, encode_import_photo
+from core.models import Course, Student
+from core.storage import photo_storage
+from core.summary import invalidate_summary, COUNTS, LOW_ATTENDANCE
+
+
+PHOTO_EXTENSIONS = ['.jpg', '.jpeg', '.png']
+
+
+class Command(BaseCommand):
+    help = (
+        'Bulk-register students from a CSV (registration_number, name, email, '
+        'phone, course_code, photo) and a directory of photos. Students already '
+        'in the database are skipped, so an interrupted import can simply be re-run.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_path')
+        parser.add_argument('photo_dir')
+        parser.add_argument('--processes', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--chunk-size', type=int, default=200,
+                            help='Students encoded and inserted per committed batch')
+        parser.add_argument('--failures', help='Write rows that failed to this CSV file')
+
+    def handle(self, *args, **options):
+        rows = self._read_rows(options['csv_path'])
+        courses = {course.course_code: course for course in Course.objects.all()}
+        existing_numbers = set(Student.objects.values_list('registration_number', flat=True))
+        existing_emails = set(Student.objects.values_list('email', flat=True))
+
+        failures = []
+        pending = []
+        skipped = 0
+        for row in rows:
+            if row['registration_number'] in existing_numbers:
+                skipped += 1
+                continue
+            if row['email'] in existing_emails:
+                failures.append((row, 'Email already registered'))
+                continue
+            if row.get('course_code') and row['course_code'] not in courses:
+                failures.append((row, f"Unknown course {row['course_code']}"))
+                continue
+            photo_path = self._find_photo(options['photo_dir'], row)
+            if photo_path is None:
+                failures.append((row, 'Photo not found'))
+                continue
+            existing_numbers.add(row['registration_number'])
+            existing_emails.add(row['email'])
+            pending.append((row, photo_path))
+
+        self.stdout.write(f'{len(rows)} rows: {skipped} already imported, {len(pending)} to import')
+
+        face_service = get_face_service()
+        imported = 0
+        start = time.perf_counter()
+
+        with make_encoding_pool(options['processes'], face_service) as pool:
+            for offset in range(0, len(pending), options['chunk_size']):
+                chunk = pending[offset:offset + options['chunk_size']]
+                chunk_start = time.perf_counter()
+
+                work = [(index, photo_path) for index, (_, photo_path) in enumerate(chunk)]
+                students = []
+                for index, encoding_bytes, error in pool.imap_unordered(encode_import_photo, work):
+                    row, photo_path = chunk[index]
+                    if not encoding_bytes:
+                        failures.append((row, error))
+                        continue
+                    students.append(self._build_student(
+                        row, photo_path, encoding_bytes, courses, face_service.encoding_version
+                    ))
+
+                # Each chunk is committed on its own, so a re-run resumes after the last one
+                with transaction.atomic():
+                    Student.objects.bulk_create(students)
+                imported += len(students)
+
+                elapsed = time.perf_counter() - chunk_start
+                self.stdout.write(
+                    f'{offset + len(chunk)}/{len(pending)} processed, {imported} imported '
+                    f'({len(chunk) / elapsed:.1f} photos/sec)'
+                )
+
+        elapsed = time.perf_counter() - start
+        if pending:
+            self.stdout.write(self.style.SUCCESS(
+                f'Imported {imported} students in {elapsed:.1f}s '
+                f'({len(pending) / elapsed:.1f} photos/sec on {options["processes"]} processes)'
+            ))
+
+        for row, error in failures:
+            self.stdout.write(self.style.WARNING(f"{row['registration_number']}: {error}"))
+        if failures and options['failures']:
+            self._write_failures(options['failures'], failures)
+
+        # bulk_create sends no post_save, so refresh the index and cached figures here
+        if imported:
+            invalidate_summary(COUNTS, LOW_ATTENDANCE)
+            student_index.rebuild()
+
+    def _read_rows(self, csv_path):
+        try:
+            with open(csv_path, newline='', encoding='utf-8-sig') as f:
+                rows = list(csv.DictReader(f))
+        except OSError as e:
+            raise CommandError(f'Cannot read {csv_path}: {e}')
+
+        required = {'registration_number', 'name', 'email'}
+        if rows and not required.issubset(rows[0].keys()):
+            raise CommandError(f'CSV must have columns: {", ".join(sorted(required))}')
+        return [{key: (value or '').strip() for key, value in row.items()} for row in rows]
+
+    def _find_photo(self, photo_dir, row):
+        if row.get('photo'):
+            path = os.path.join(photo_dir, row['photo'])
+            return path if os.path.exists(path) else None
+        for extension in PHOTO_EXTENSIONS:
+            path = os.path.join(photo_dir, row['registration_number'] + extension)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def _build_student(self, row, photo_path, encoding_bytes, courses, encoding_version):
+        extension = os.path.splitext(photo_path)[1].lower() or '.jpg'
+        with open(photo_path, 'rb') as f:
+            photo_name = photo_storage.save(
+                f"student_photos/student_{row['registration_number']}{extension}", File(f)
+            )
+        return Student(
+            registration_number=row['registration_number'],
+            name=row['name'],
+            email=row['email'],
+            phone=row.get('phone', ''),
+            course=courses.get(row.get('course_code')),
+            photo=photo_name,
+            face_encoding=encoding_bytes,
+            encoding_status='ready',
+            encoding_version=encoding_version,
+        )
+
+    def _write_failures(self, path, failures):
+        fieldnames = list(failures[0][0].keys()) + ['error']
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction='ignore')
+            writer.writeheader()
+            for row, error in failures:
+                writer.writerow({**row, 'error': error})
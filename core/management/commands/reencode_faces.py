@@ -0,0 +1,124 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count
+
+from core.face_index import student_index
+from core.face_recognition_utils import (
+    get_face_recognition, get_face_service, make_encoding_pool, encode_photo_job,
+)
+from core.gallery_cache import gallery_cache
+from core.models import Student
+from core.storage import photo_storage
+
+
+class Command(BaseCommand):
+    help = (
+        'Re-encode students whose face encoding was made by another detection model '
+        'or face_recognition/dlib release, from their stored photos, on a '
+        'multiprocessing pool. Each batch is committed on its own, so an '
+        'interrupted run resumes where it stopped. Until a student is re-encoded '
+        'they are left out of matching rather than compared across versions.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--batch-size', type=int, default=200,
+                            help='Students encoded and saved per committed batch')
+        parser.add_argument('--limit', type=int, help='Stop after this many students')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report how many students are outdated, by version')
+        parser.add_argument('--tag-untagged', action='store_true',
+                            help='Tag encodings saved before versioning with the current version '
+                                 'instead of re-encoding them; only if the model has not changed since')
+
+    def handle(self, *args, **options):
+        face_service = get_face_service()
+        version = face_service.encoding_version
+        outdated = Student.objects.exclude(encoding_version=version).exclude(face_encoding=b'')
+
+        if options['tag_untagged']:
+            tagged = outdated.filter(encoding_version='').update(encoding_version=version)
+            self.stdout.write(self.style.SUCCESS(f'Tagged {tagged} encodings as {version}'))
+            self._refresh_caches()
+            return
+
+        self.stdout.write(f'Current encoding version: {version}')
+        for row in outdated.values('encoding_version').annotate(students=Count('id')).order_by('encoding_version'):
+            self.stdout.write(f"  {row['encoding_version'] or '(untagged)'}: {row['students']} students")
+        if options['dry_run']:
+            return
+
+        if get_face_recognition() is None:
+            raise CommandError('face_recognition library not installed')
+
+        without_photo = outdated.filter(photo='').count()
+        if without_photo:
+            self.stdout.write(self.style.WARNING(
+                f'{without_photo} outdated students have no photo and need to register again'
+            ))
+
+        pending = outdated.exclude(photo='').order_by('pk')
+        total = pending.count()
+        if options['limit'] is not None:
+            total = min(total, options['limit'])
+
+        done = 0
+        failures = []
+        last_pk = 0
+        start = time.perf_counter()
+
+        with make_encoding_pool(options['processes'], face_service) as pool:
+            while done + len(failures) < total:
+                size = min(options['batch_size'], total - done - len(failures))
+                # Keyset over pk, so students that fail are not picked up again in this run
+                batch = list(pending.filter(pk__gt=last_pk).values_list('pk', 'photo')[:size])
+                if not batch:
+                    break
+                last_pk = batch[-1][0]
+                batch_start = time.perf_counter()
+
+                work = [(student_id, photo_storage.path(photo)) for student_id, photo in batch]
+                students = []
+                failed_ids = []
+                for student_id, encoding_bytes, error, _ in pool.imap_unordered(encode_photo_job, work):
+                    if encoding_bytes:
+                        students.append(Student(
+                            pk=student_id,
+                            face_encoding=encoding_bytes,
+                            encoding_status='ready',
+                            encoding_version=version,
+                        ))
+                    else:
+                        failed_ids.append(student_id)
+                        failures.append((student_id, error))
+
+                with transaction.atomic():
+                    Student.objects.bulk_update(students, ['face_encoding', 'encoding_status', 'encoding_version'])
+                    # The outdated encoding is kept but never matched; a later run retries
+                    Student.objects.filter(pk__in=failed_ids).update(encoding_status='failed')
+                done += len(students)
+
+                elapsed = time.perf_counter() - batch_start
+                self.stdout.write(
+                    f'{done + len(failures)}/{total} processed, {done} re-encoded '
+                    f'({len(batch) / elapsed:.1f} photos/sec)'
+                )
+
+        # bulk_update sends no post_save, so refresh this process's gallery cache
+        # and the shared index; other processes reload theirs by TTL and mtime
+        if done:
+            self._refresh_caches()
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Re-encoded {done} students in {elapsed:.1f}s on {options["processes"]} processes'
+        ))
+        for student_id, error in failures:
+            self.stdout.write(self.style.WARNING(f'Student {student_id}: {error}'))
+
+    def _refresh_caches(self):
+        gallery_cache.invalidate()
+        student_index.rebuild()
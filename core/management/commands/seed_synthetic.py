@@ -0,0 +1,133 @@
+import time
+from datetime import date, time as session_time, timedelta
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.face_index import student_index
+from core.face_recognition_utils import get_face_service
+from core.gallery_cache import gallery_cache
+from core.models import Course, Student, AttendanceSession, Attendance
+from core.presence import session_presence
+from core.summary import invalidate_summary
+
+
+SYNTHETIC_PREFIX = 'SYN'
+
+
+class Command(BaseCommand):
+    help = (
+        'Fill the database with synthetic courses, students (random 128-d face '
+        'encodings, no photos), sessions and attendance history for load testing. '
+        'Synthetic rows are prefixed with SYN and can be removed with --clear.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--courses', type=int, default=10)
+        parser.add_argument('--students', type=int, default=1000,
+                            help='Total students, spread evenly over the courses')
+        parser.add_argument('--sessions', type=int, default=40, help='Past sessions per course')
+        parser.add_argument('--present-rate', type=float, default=0.8)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--clear', action='store_true',
+                            help='Delete existing synthetic data first')
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        batch_size = options['batch_size']
+        start = time.perf_counter()
+
+        if options['clear']:
+            deleted = self.clear()
+            self.stdout.write(f'Removed {deleted} synthetic courses and their students')
+
+        first = Course.objects.filter(course_code__startswith=SYNTHETIC_PREFIX).count()
+        face_service = get_face_service()
+
+        with transaction.atomic():
+            courses = Course.objects.bulk_create([
+                Course(course_code=f'{SYNTHETIC_PREFIX}{first + i:04d}', course_name=f'Synthetic Course {first + i}')
+                for i in range(options['courses'])
+            ])
+            courses = list(Course.objects.filter(course_code__in=[course.course_code for course in courses]))
+
+            first_student = Student.objects.filter(registration_number__startswith=SYNTHETIC_PREFIX).count()
+            encodings = rng.normal(0, 0.1, (options['students'], 128))
+            Student.objects.bulk_create([
+                Student(
+                    registration_number=f'{SYNTHETIC_PREFIX}{first_student + i:07d}',
+                    name=f'Synthetic Student {first_student + i}',
+                    email=f'{SYNTHETIC_PREFIX.lower()}{first_student + i}@example.com',
+                    course=courses[i % len(courses)],
+                    face_encoding=face_service.encoding_to_bytes(encodings[i]),
+                    encoding_status='ready',
+                    # Tagged as current so the synthetic encodings are matched
+                    encoding_version=face_service.encoding_version,
+                )
+                for i in range(options['students'])
+            ], batch_size=batch_size)
+
+            today = date.today()
+            AttendanceSession.objects.bulk_create([
+                AttendanceSession(
+                    course=course,
+                    session_date=today - timedelta(days=day + 1),
+                    session_time=session_time(9),
+                )
+                for course in courses
+                for day in range(options['sessions'])
+            ], batch_size=batch_size)
+
+            sessions = list(AttendanceSession.objects.filter(course__in=courses).values_list('id', 'course_id'))
+            students_by_course = {}
+            for student_id, course_id in Student.objects.filter(course__in=courses).values_list('id', 'course_id'):
+                students_by_course.setdefault(course_id, []).append(student_id)
+
+            rows = 0
+            batch = []
+            for session_id, course_id in sessions:
+                student_ids = students_by_course.get(course_id, [])
+                present = rng.random(len(student_ids)) < options['present_rate']
+                for student_id, is_present in zip(student_ids, present):
+                    batch.append(Attendance(
+                        session_id=session_id,
+                        student_id=student_id,
+                        status='present' if is_present else 'absent',
+                        marked_by='face_recognition' if is_present else 'system',
+                        confidence_score=round(float(rng.uniform(60, 99)), 2) if is_present else None,
+                    ))
+                if len(batch) >= batch_size:
+                    Attendance.objects.bulk_create(batch, batch_size=batch_size)
+                    rows += len(batch)
+                    batch = []
+            Attendance.objects.bulk_create(batch, batch_size=batch_size)
+            rows += len(batch)
+
+        # bulk_create sends no signals, so drop this process's caches explicitly
+        self._refresh_caches()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {len(courses)} courses, {options["students"]} students, '
+            f'{len(sessions)} sessions and {rows} attendance rows '
+            f'in {time.perf_counter() - start:.1f}s'
+        ))
+
+    def clear(self):
+        courses = Course.objects.filter(course_code__startswith=SYNTHETIC_PREFIX)
+        count = courses.count()
+        students = Student.objects.filter(registration_number__startswith=SYNTHETIC_PREFIX)
+        # The index signals run on commit, so the whole transaction sits inside deferred_saves()
+        with student_index.deferred_saves(), transaction.atomic():
+            Attendance.objects.filter(student__in=students).delete()
+            students.delete()
+            courses.delete()
+        self._refresh_caches()
+        return count
+
+    def _refresh_caches(self):
+        gallery_cache.invalidate()
+        session_presence.invalidate()
+        invalidate_summary()
+        student_index.rebuild()
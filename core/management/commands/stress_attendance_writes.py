@@ -0,0 +1,175 @@
+import random
+import threading
+import time
+from io import BytesIO
+
+import numpy as np
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+from PIL import Image
+
+from core.management.throwaway_db import throwaway_database
+from core.marking import apply_manual_attendance, mark_face_attendance
+from core.models import Attendance, AttendanceSession
+from core.presence import session_presence
+
+
+# Django's own SQLite behaviour, for comparison with the tuned settings
+BASELINE_OPTIONS = {'timeout': 5, 'init_command': 'PRAGMA journal_mode=DELETE'}
+
+
+class Command(BaseCommand):
+    help = (
+        'Reproduce several kiosks marking attendance at once: writer threads mark '
+        'students present through the face-recognition path while faculty threads '
+        'save manual attendance and reader threads query it. Reports "database is locked" errors and write latency. '
+        'Runs in a throwaway SQLite database; pass --baseline for Django\'s defaults.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kiosks', type=int, default=16, help='Concurrent writer threads')
+        parser.add_argument('--faculty', type=int, default=2,
+                            help='Threads saving manual attendance (a read-then-write transaction)')
+        parser.add_argument('--readers', type=int, default=2, help='Concurrent report reader threads')
+        parser.add_argument('--students', type=int, default=200)
+        parser.add_argument('--sessions', type=int, default=10, help='Sessions marked during the test')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--baseline', action='store_true',
+                            help='Rollback journal, 5 s busy timeout and deferred transactions')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('This stress test targets the SQLite backend')
+
+        with throwaway_database('stress.sqlite3', options=BASELINE_OPTIONS if options['baseline'] else None):
+            call_command('seed_synthetic', students=options['students'], courses=1,
+                         sessions=options['sessions'], present_rate=0, seed=options['seed'],
+                         stdout=self.stdout)
+            self._run(options)
+
+    def _run(self, options):
+        journal_mode = connection.cursor().execute('PRAGMA journal_mode').fetchone()[0]
+        self.stdout.write(
+            f"journal_mode={journal_mode}, timeout={connection.settings_dict['OPTIONS'].get('timeout')}s, "
+            f"transactions={connection.settings_dict['OPTIONS'].get('transaction_mode') or 'DEFERRED'}"
+        )
+
+        marks = list(
+            Attendance.objects.values_list('session_id', 'student_id', 'confidence_score')
+        )
+        random.Random(options['seed']).shuffle(marks)
+        sessions = AttendanceSession.objects.in_bulk()
+        session_presence.invalidate()
+
+        output = BytesIO()
+        Image.new('RGB', (320, 240), (128, 128, 128)).save(output, format='JPEG')
+        image_bytes = output.getvalue()
+
+        queue_lock = threading.Lock()
+        results_lock = threading.Lock()
+        latencies = []
+        errors = {}
+        statuses = {}
+        reads = [0]
+        manual_saves = [0]
+        stop = threading.Event()
+
+        def record_error(e):
+            with results_lock:
+                errors[str(e)] = errors.get(str(e), 0) + 1
+
+        def kiosk():
+            try:
+                while True:
+                    with queue_lock:
+                        if not marks:
+                            return
+                        session_id, student_id, _ = marks.pop()
+                    start = time.perf_counter()
+                    try:
+                        status, _ = mark_face_attendance(
+                            sessions[session_id], student_id, 90.0, image_bytes
+                        )
+                    except OperationalError as e:
+                        record_error(e)
+                        continue
+                    elapsed = (time.perf_counter() - start) * 1000
+                    with results_lock:
+                        latencies.append(elapsed)
+                        statuses[status] = statuses.get(status, 0) + 1
+            finally:
+                connections.close_all()
+
+        def faculty(seed):
+            rng = random.Random(seed)
+            session_ids = list(sessions)
+            try:
+                while not stop.is_set():
+                    session = sessions[rng.choice(session_ids)]
+                    present = Attendance.objects.filter(
+                        session=session, status='present'
+                    ).values_list('student_id', flat=True)
+                    try:
+                        # Re-saving the current present set still reads and locks the rows
+                        apply_manual_attendance(session, list(present))
+                    except OperationalError as e:
+                        record_error(e)
+                        continue
+                    with results_lock:
+                        manual_saves[0] += 1
+            finally:
+                connections.close_all()
+
+        def reader():
+            try:
+                while not stop.is_set():
+                    try:
+                        list(Attendance.objects.select_related('student', 'session').order_by('-marked_at')[:100])
+                        Attendance.objects.filter(status='present').count()
+                    except OperationalError as e:
+                        record_error(e)
+                        continue
+                    with results_lock:
+                        reads[0] += 1
+            finally:
+                connections.close_all()
+
+        total = len(marks)
+        readers = [threading.Thread(target=reader) for _ in range(options['readers'])]
+        readers += [
+            threading.Thread(target=faculty, args=(options['seed'] + i,)) for i in range(options['faculty'])
+        ]
+        kiosks = [threading.Thread(target=kiosk) for _ in range(options['kiosks'])]
+        start = time.perf_counter()
+        for thread in readers + kiosks:
+            thread.start()
+        for thread in kiosks:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        stop.set()
+        for thread in readers:
+            thread.join()
+
+        self._report(total, latencies, statuses, errors, reads[0], manual_saves[0], elapsed)
+
+    def _report(self, total, latencies, statuses, errors, reads, manual_saves, elapsed):
+        self.stdout.write(
+            f'{total} marks by {len(latencies)} successful calls in {elapsed:.1f}s '
+            f'({len(latencies) / elapsed:.0f} marks/sec), {manual_saves} manual saves, '
+            f'{reads} report reads'
+        )
+        self.stdout.write('  ' + ', '.join(f'{status}: {count}' for status, count in sorted(statuses.items())))
+        if latencies:
+            latencies = np.array(latencies)
+            self.stdout.write(
+                f'  mark latency ms: p50 {np.percentile(latencies, 50):.1f}  '
+                f'p95 {np.percentile(latencies, 95):.1f}  p99 {np.percentile(latencies, 99):.1f}  '
+                f'max {latencies.max():.1f}'
+            )
+        lock_errors = sum(count for error, count in errors.items() if 'locked' in error)
+        style = self.style.ERROR if lock_errors else self.style.SUCCESS
+        self.stdout.write(style(f'  "database is locked" errors: {lock_errors}'))
+        for error, count in sorted(errors.items()):
+            if 'locked' not in error:
+                self.stdout.write(self.style.WARNING(f'  {error}: {count}'))
@@ -0,0 +1,39 @@
+import os
+import tempfile
+from contextlib import contextmanager
+
+from django.db import connection
+from django.test.utils import override_settings
+
+from core.face_index import student_index
+
+
+# The shared file cache would mix throwaway figures into the real dashboard's
+LOCAL_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@contextmanager
+def throwaway_database(name, options=None):
+    """Run the with block against a fresh test database, then destroy it.
+
+    The database file, media and student index live in a temporary
+    directory and caches in local memory, so nothing written reaches the
+    real ones. `options` replaces the connection's OPTIONS meanwhile.
+    Yields the temporary directory.
+    """
+    with tempfile.TemporaryDirectory() as tmp, override_settings(
+        MEDIA_ROOT=os.path.join(tmp, 'media'), CACHES=LOCAL_CACHES,
+    ), student_index.using_path(os.path.join(tmp, 'face_index.npz')):
+        old_name = connection.settings_dict['NAME']
+        old_options = connection.settings_dict['OPTIONS']
+        if connection.vendor == 'sqlite':
+            # A file rather than the default in-memory test database, so disk I/O is measured
+            connection.settings_dict['TEST']['NAME'] = os.path.join(tmp, name)
+        if options is not None:
+            connection.settings_dict['OPTIONS'] = options
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            yield tmp
+        finally:
+            connection.settings_dict['OPTIONS'] = old_options
+            connection.creation.destroy_test_db(old_name, verbosity=0)
@@ -0,0 +1,92 @@
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+
+from .metrics import stage
+from .models import Attendance
+from .presence import session_presence
+from .summary import invalidate_summary, LOW_ATTENDANCE
+
+
+def apply_manual_attendance(session, present_student_ids, marked_by='faculty'):
+    """Bring a session's attendance in line with the given present set.
+
+    Only rows whose status actually changes are written, using at most one
+    SELECT and two UPDATE statements. Returns the number of changed rows.
+    """
+    present_student_ids = {int(student_id) for student_id in present_student_ids}
+
+    with transaction.atomic():
+        rows = Attendance.objects.select_for_update().filter(
+            session=session
+        ).values_list('id', 'student_id', 'status')
+
+        to_present = []
+        to_absent = []
+        for attendance_id, student_id, status in rows:
+            should_be_present = student_id in present_student_ids
+            if should_be_present and status != 'present':
+                to_present.append(attendance_id)
+            elif not should_be_present and status != 'absent':
+                to_absent.append(attendance_id)
+
+        if to_present:
+            Attendance.objects.filter(id__in=to_present).update(status='present', marked_by=marked_by)
+        if to_absent:
+            Attendance.objects.filter(id__in=to_absent).update(status='absent', marked_by=marked_by)
+
+        # update() sends no post_save, so drop the cached figures explicitly
+        if to_present or to_absent:
+            transaction.on_commit(lambda: session_presence.invalidate(session.id))
+            transaction.on_commit(lambda: invalidate_summary(LOW_ATTENDANCE))
+
+    return len(to_present) + len(to_absent)
+
+
+def mark_face_attendance(session, student_id, confidence, image_bytes):
+    """Mark a recognized student present and keep the captured frame.
+
+    Returns (status, student_name) where status is 'marked', 'already_present'
+    or 'not_enrolled' (no attendance row for this student in the session).
+    Students already present are answered from the session's cached present
+    set, without reading or writing attendance rows or saving the frame.
+    """
+    name = session_presence.name_if_present(session.id, student_id)
+    if name is not None:
+        return 'already_present', name
+
+    attendance = Attendance.objects.select_related('student').filter(
+        session=session,
+        student_id=student_id
+    ).first()
+
+    if attendance is None:
+        return 'not_enrolled', None
+    if attendance.status == 'present':
+        # Marked by another process since the present set was loaded
+        session_presence.mark_present(session.id, student_id, attendance.student.name)
+        return 'already_present', attendance.student.name
+
+    now = timezone.now()
+    name = attendance.student.name
+    # Written before the transaction so file I/O never holds the database write lock
+    with stage('photo_save'):
+        attendance.photo_captured.save(
+            f'attendance_{session.id}_{student_id}_{now.strftime("%Y%m%d_%H%M%S")}.jpg',
+            ContentFile(image_bytes),
+            save=False
+        )
+    with stage('db_write'), transaction.atomic():
+        # Conditional, so a kiosk that marked the student since the read above wins
+        marked = Attendance.objects.filter(pk=attendance.pk).exclude(status='present').update(
+            status='present',
+            marked_by='face_recognition',
+            confidence_score=confidence,
+            marked_at=now,
+            photo_captured=attendance.photo_captured.name,
+        )
+        # update() sends no post_save, so patch the cached figures explicitly
+        transaction.on_commit(lambda: session_presence.mark_present(session.id, student_id, name))
+        if marked:
+            transaction.on_commit(lambda: invalidate_summary(LOW_ATTENDANCE))
+    return ('marked' if marked else 'already_present'), name
@@ -0,0 +1,146 @@
+"""In-process timing histograms and counters, rendered in Prometheus text format.
+
+Values are kept per process; with several web workers each /metrics scrape
+reports the worker that answered it, so scrape each worker or run one.
+"""
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+# Stage timings of the request being handled, for its Server-Timing header
+_request_timings = contextvars.ContextVar('request_timings', default=None)
+
+
+class Histogram:
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help = {}
+        self._histograms = {}
+        self._counters = {}
+
+    def describe(self, name, kind, help_text):
+        self._help[name] = (kind, help_text)
+
+    def observe(self, name, value, buckets=DURATION_BUCKETS, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def render(self, extra_counters=()):
+        """Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            counters = sorted(self._counters.items()) + list(extra_counters)
+            histograms = sorted(
+                (key, list(h.counts), h.sum, h.count, h.buckets)
+                for key, h in self._histograms.items()
+            )
+
+        lines = []
+        described = set()
+
+        def header(name):
+            if name not in described and name in self._help:
+                kind, help_text = self._help[name]
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {kind}')
+            described.add(name)
+
+        for (name, labels), value in counters:
+            header(name)
+            lines.append(f'{name}{_format_labels(labels)} {value}')
+
+        for (name, labels), counts, total, count, buckets in histograms:
+            header(name)
+            cumulative = 0
+            for bound, bucket_count in zip(buckets + ('+Inf',), counts):
+                cumulative += bucket_count
+                lines.append(f'{name}_bucket{_format_labels(labels + (("le", bound),))} {cumulative}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {total}')
+            lines.append(f'{name}_count{_format_labels(labels)} {count}')
+
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+registry = MetricsRegistry()
+registry.describe('face_pipeline_stage_seconds', 'histogram', 'Time spent in each stage of the face pipeline')
+registry.describe('http_requests_total', 'counter', 'Requests handled, by view, method and status')
+registry.describe('http_request_duration_seconds', 'histogram', 'Request handling time by view')
+registry.describe('http_request_db_queries', 'histogram', 'Database queries per request by view')
+registry.describe('summary_cache_hits_total', 'counter', 'Home and dashboard figures served from the cache')
+registry.describe('summary_cache_misses_total', 'counter', 'Home and dashboard figures recomputed')
+registry.describe('face_pool_rejected_total', 'counter', 'Face pool calls refused with 429, by reason')
+registry.describe('summary_cache_invalidations_total', 'counter', 'Cached home and dashboard figures dropped')
+
+
+@contextmanager
+def stage(name):
+    """Time one face pipeline stage into its histogram and the Server-Timing header"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - start)
+
+
+def record_stage(name, elapsed):
+    """Record a stage timed elsewhere, e.g. in a face pool process"""
+    registry.observe('face_pipeline_stage_seconds', elapsed, stage=name)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((name, elapsed))
+
+
+def start_request_timing():
+    timings = []
+    return timings, _request_timings.set(timings)
+
+
+def stop_request_timing(token):
+    _request_timings.reset(token)
+
+
+def server_timing_header(timings):
+    """Sum repeated stages and format them as a Server-Timing header value"""
+    totals = {}
+    for name, elapsed in timings:
+        totals[name] = totals.get(name, 0.0) + elapsed
+    return ', '.join(f'{name};dur={elapsed * 1000:.1f}' for name, elapsed in totals.items())
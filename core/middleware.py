@@ -0,0 +1,69 @@
+import time
+
+from django.db import connection
+from django.http import HttpResponse, JsonResponse
+
+from .face_pool import FacePoolBusy
+
+from .metrics import (
+    registry, start_request_timing, stop_request_timing, server_timing_header,
+    QUERY_COUNT_BUCKETS,
+)
+
+
+class MetricsMiddleware:
+    """Per-view request counts, durations and query counts, plus a Server-Timing header"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        db = {'queries': 0, 'time': 0.0}
+
+        def count_queries(execute, sql, params, many, context):
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                db['queries'] += 1
+                db['time'] += time.perf_counter() - start
+
+        timings, token = start_request_timing()
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(count_queries):
+                response = self.get_response(request)
+        finally:
+            stop_request_timing(token)
+        elapsed = time.perf_counter() - start
+
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        registry.inc('http_requests_total', view=view, method=request.method, status=response.status_code)
+        registry.observe('http_request_duration_seconds', elapsed, view=view)
+        registry.observe('http_request_db_queries', db['queries'], buckets=QUERY_COUNT_BUCKETS, view=view)
+
+        response['Server-Timing'] = server_timing_header(
+            timings + [('db', db['time']), ('total', elapsed)]
+        )
+        return response
+
+
+class FacePoolBusyMiddleware:
+    """Answer requests refused by a saturated face pool with 429 and Retry-After"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_exception(self, request, exception):
+        if not isinstance(exception, FacePoolBusy):
+            return None
+        if 'text/html' in request.headers.get('Accept', ''):
+            response = HttpResponse(str(exception), status=429, content_type='text/plain; charset=utf-8')
+        else:
+            response = JsonResponse({'status': 'busy', 'error': str(exception)}, status=429)
+        response['Retry-After'] = str(exception.retry_after)
+        return response
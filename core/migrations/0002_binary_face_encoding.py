@@ -0,0 +1,60 @@
+from django.db import migrations, models
+import numpy as np
+
+
+ENCODING_FORMAT_FLOAT32 = 1
+
+
+def text_to_binary(apps, schema_editor):
+    Student = apps.get_model('core', 'Student')
+    students = []
+    for student in Student.objects.exclude(face_encoding='').only('id', 'face_encoding'):
+        try:
+            encoding = np.array(student.face_encoding.split(','), dtype='<f4')
+        except ValueError:
+            continue
+        student.face_encoding_binary = bytes([ENCODING_FORMAT_FLOAT32]) + encoding.tobytes()
+        students.append(student)
+    Student.objects.bulk_update(students, ['face_encoding_binary'], batch_size=500)
+
+
+def binary_to_text(apps, schema_editor):
+    Student = apps.get_model('core', 'Student')
+    students = []
+    for student in Student.objects.exclude(face_encoding_binary=b'').only('id', 'face_encoding_binary'):
+        data = bytes(student.face_encoding_binary)
+        dtype = '<f4' if data[0] == ENCODING_FORMAT_FLOAT32 else '<f2'
+        encoding = np.frombuffer(data, dtype=dtype, offset=1)
+        student.face_encoding = ','.join(map(str, encoding.astype(float).tolist()))
+        students.append(student)
+    Student.objects.bulk_update(students, ['face_encoding'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='student',
+            name='face_encoding_binary',
+            field=models.BinaryField(blank=True, default=b''),
+        ),
+        migrations.RunPython(text_to_binary, binary_to_text),
+        migrations.RemoveField(
+            model_name='student',
+            name='face_encoding',
+        ),
+        migrations.RenameField(
+            model_name='student',
+            old_name='face_encoding_binary',
+            new_name='face_encoding',
+        ),
+        migrations.AlterField(
+            model_name='student',
+            name='face_encoding',
+            field=models.BinaryField(blank=True, default=b'', help_text='Stored face encoding for recognition (format byte + packed floats)'),
+        ),
+    ]
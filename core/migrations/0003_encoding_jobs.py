@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def mark_encoded_students_ready(apps, schema_editor):
+    Student = apps.get_model('core', 'Student')
+    Student.objects.exclude(face_encoding=b'').update(encoding_status='ready')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_binary_face_encoding'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='student',
+            name='encoding_status',
+            field=models.CharField(choices=[('none', 'No encoding'), ('pending', 'Pending encoding'), ('ready', 'Ready'), ('failed', 'Failed')], default='none', max_length=10),
+        ),
+        migrations.RunPython(mark_encoded_students_ready, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='EncodingJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], db_index=True, default='pending', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('max_attempts', models.PositiveIntegerField(default=3)),
+                ('error', models.TextField(blank=True)),
+                ('claimed_by', models.CharField(blank=True, max_length=64)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='encoding_jobs', to='core.student')),
+            ],
+            options={
+                'ordering': ['created_at'],
+            },
+        ),
+    ]
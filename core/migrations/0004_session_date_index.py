@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:48
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_encoding_jobs'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='attendancesession',
+            name='session_date',
+            field=models.DateField(db_index=True, default=django.utils.timezone.now),
+        ),
+    ]
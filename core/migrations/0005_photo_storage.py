@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:51
+
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_session_date_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='attendance',
+            name='photo_captured',
+            field=models.ImageField(blank=True, null=True, storage=core.storage.get_photo_storage, upload_to='attendance_photos/'),
+        ),
+        migrations.AlterField(
+            model_name='student',
+            name='photo',
+            field=models.ImageField(help_text='Upload a clear face photo for recognition', storage=core.storage.get_photo_storage, upload_to='student_photos/'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_photo_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='student',
+            name='encoding_version',
+            field=models.CharField(blank=True, db_index=True, default='', help_text='Detection model and library releases that produced face_encoding', max_length=64),
+        ),
+    ]
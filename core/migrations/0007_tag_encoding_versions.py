@@ -0,0 +1,27 @@
+from django.db import migrations
+
+from core.face_recognition_utils import _package_versions
+
+
+# Every encoding saved before versioning came from the 'hog' model
+UNVERSIONED_MODEL = 'hog'
+
+
+def tag_unversioned_encodings(apps, schema_editor):
+    # Assumes face_recognition and dlib are not upgraded in the same deploy,
+    # so the releases installed now are the ones that made these encodings
+    Student = apps.get_model('core', 'Student')
+    Student.objects.filter(encoding_version='').exclude(face_encoding=b'').update(
+        encoding_version=f'{UNVERSIONED_MODEL}/{_package_versions()}'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_student_encoding_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(tag_unversioned_encodings, migrations.RunPython.noop),
+    ]
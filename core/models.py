@@ -1,8 +1,12 @@
 from django.db import models
+from django.db.models import Count, F, FloatField, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Cast, Coalesce, NullIf, Round
 from django.contrib.auth.models import User
 from django.utils import timezone
 import os
 
+from .storage import get_photo_storage
+
 
 class Course(models.Model):
     course_code = models.CharField(max_length=20, unique=True)
@@ -17,30 +21,95 @@ class Course(models.Model):
         return f"{self.course_code} - {self.course_name}"
 
 
+class StudentQuerySet(models.QuerySet):
+    
+    def with_attendance_percentage(self, course=None):
+        """Annotate attendance_percentage, matching Student.get_attendance_percentage.
+        
+        Without a course, each student is measured against the sessions of
+        their own course.
+        """
+        if course:
+            total_sessions = AttendanceSession.objects.filter(course=course).count()
+            if total_sessions == 0:
+                return self.annotate(attendance_percentage=Value(0.0, output_field=FloatField()))
+            present = Q(attendances__status='present', attendances__session__course=course)
+            return self.annotate(
+                attendance_percentage=Round(
+                    Cast(Count('attendances', filter=present), FloatField()) * 100.0 / total_sessions,
+                    2
+                )
+            )
+        
+        course_sessions = AttendanceSession.objects.filter(
+            course=OuterRef('course')
+        ).order_by().values('course').annotate(total=Count('id')).values('total')
+        present = Q(attendances__status='present', attendances__session__course=F('course'))
+        return self.annotate(
+            attendance_percentage=Coalesce(
+                Round(
+                    Cast(Count('attendances', filter=present), FloatField()) * 100.0
+                    / NullIf(Subquery(course_sessions, output_field=IntegerField()), 0),
+                    2
+                ),
+                Value(0.0, output_field=FloatField()),
+            )
+        )
+
+
 class Student(models.Model):
     registration_number = models.CharField(max_length=20, unique=True)
     name = models.CharField(max_length=200)
     email = models.EmailField(unique=True)
     phone = models.CharField(max_length=15, blank=True)
     course = models.ForeignKey(Course, on_delete=models.SET_NULL, null=True, related_name='students')
-    photo = models.ImageField(upload_to='student_photos/', help_text="Upload a clear face photo for recognition")
-    face_encoding = models.TextField(blank=True, help_text="Stored face encoding for recognition")
+    photo = models.ImageField(upload_to='student_photos/', storage=get_photo_storage, help_text="Upload a clear face photo for recognition")
+    face_encoding = models.BinaryField(blank=True, default=b'', help_text="Stored face encoding for recognition (format byte + packed floats)")
+    encoding_status = models.CharField(
+        max_length=10,
+        choices=[
+            ('none', 'No encoding'),
+            ('pending', 'Pending encoding'),
+            ('ready', 'Ready'),
+            ('failed', 'Failed'),
+        ],
+        default='none'
+    )
+    encoding_version = models.CharField(
+        max_length=64, blank=True, default='', db_index=True,
+        help_text="Detection model and library releases that produced face_encoding"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     is_active = models.BooleanField(default=True)
     
+    objects = StudentQuerySet.as_manager()
+    
     class Meta:
         ordering = ['name']
     
     def __str__(self):
         return f"{self.registration_number} - {self.name}"
     
+    @property
+    def template_count(self):
+        """Number of face templates packed into face_encoding"""
+        from .face_recognition_utils import get_face_service
+        encodings = get_face_service().bytes_to_encodings(self.face_encoding)
+        return 0 if encodings is None else len(encodings)
+    
+    @property
+    def has_current_encoding(self):
+        """Whether face_encoding was made by the current model, so it may be matched"""
+        from .face_recognition_utils import get_face_service
+        return bool(self.face_encoding) and self.encoding_version == get_face_service().encoding_version
+    
     def get_attendance_percentage(self, course=None):
-        if course:
-            total_sessions = AttendanceSession.objects.filter(course=course).count()
-            attended = Attendance.objects.filter(student=self, session__course=course, status='present').count()
-        else:
-            total_sessions = AttendanceSession.objects.all().count()
-            attended = Attendance.objects.filter(student=self, status='present').count()
+        # Measured against the student's own course unless another is given
+        course = course or self.course_id
+        if not course:
+            return 0
+        total_sessions = AttendanceSession.objects.filter(course=course).count()
+        attended = Attendance.objects.filter(student=self, session__course=course, status='present').count()
         
         if total_sessions == 0:
             return 0
@@ -50,7 +119,7 @@ class Student(models.Model):
 class AttendanceSession(models.Model):
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='sessions')
     faculty = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
-    session_date = models.DateField(default=timezone.now)
+    session_date = models.DateField(default=timezone.now, db_index=True)
     session_time = models.TimeField(default=timezone.now)
     session_type = models.CharField(
         max_length=20,
@@ -98,7 +167,7 @@ class Attendance(models.Model):
     marked_at = models.DateTimeField(auto_now_add=True)
     marked_by = models.CharField(max_length=50, default='system')  # 'faculty', 'face_recognition', 'system'
     confidence_score = models.FloatField(null=True, blank=True, help_text="Face recognition confidence")
-    photo_captured = models.ImageField(upload_to='attendance_photos/', null=True, blank=True)
+    photo_captured = models.ImageField(upload_to='attendance_photos/', storage=get_photo_storage, null=True, blank=True)
     
     class Meta:
         ordering = ['-marked_at']
@@ -106,3 +175,32 @@ class Attendance(models.Model):
     
     def __str__(self):
         return f"{self.student.name} - {self.session} - {self.status}"
+
+
+class EncodingJob(models.Model):
+    """Queued face encoding for a student photo, processed by manage.py encoding_worker"""
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='encoding_jobs')
+    status = models.CharField(
+        max_length=10,
+        choices=[
+            ('pending', 'Pending'),
+            ('running', 'Running'),
+            ('done', 'Done'),
+            ('failed', 'Failed'),
+        ],
+        default='pending',
+        db_index=True
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    error = models.TextField(blank=True)
+    claimed_by = models.CharField(max_length=64, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['created_at']
+    
+    def __str__(self):
+        return f"{self.student.name} - {self.status}"
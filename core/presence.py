@@ -0,0 +1,101 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+class SessionPresenceCache:
+    """Process-wide LRU cache of who is already present, keyed by session id.
+
+    Each entry maps present student ids to names, so a student recognized a
+    second time can be answered from memory without touching the database.
+    """
+
+    def __init__(self, max_sessions=None):
+        self._max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._loaded_at = {}
+        self._lock = threading.Lock()
+        # Bumped on every mutation so a load racing a write is not cached stale
+        self._generation = 0
+
+    @property
+    def max_sessions(self):
+        if self._max_sessions is None:
+            return getattr(settings, 'SESSION_PRESENCE_CACHE_SIZE', 64)
+        return self._max_sessions
+
+    @property
+    def ttl(self):
+        # Bounds how long attendance changed by other processes stays unseen
+        return getattr(settings, 'SESSION_PRESENCE_CACHE_TTL', 60)
+
+    def get(self, session_id):
+        """Return {student_id: name} of students marked present in the session."""
+        with self._lock:
+            present = self._sessions.get(session_id)
+            fresh = present is not None and (
+                not self.ttl or time.monotonic() - self._loaded_at[session_id] < self.ttl
+            )
+            if fresh:
+                self._sessions.move_to_end(session_id)
+                return present
+            generation = self._generation
+
+        present = self._load(session_id)
+
+        with self._lock:
+            if generation != self._generation:
+                return present
+            self._sessions[session_id] = present
+            self._sessions.move_to_end(session_id)
+            self._loaded_at[session_id] = time.monotonic()
+            while len(self._sessions) > self.max_sessions:
+                evicted, _ = self._sessions.popitem(last=False)
+                self._loaded_at.pop(evicted, None)
+        return present
+
+    def name_if_present(self, session_id, student_id):
+        """The student's name if already marked present, else None."""
+        return self.get(session_id).get(student_id)
+
+    def mark_present(self, session_id, student_id, name):
+        with self._lock:
+            self._generation += 1
+            present = self._sessions.get(session_id)
+            if present is not None:
+                # Copy on write: readers may hold the previous dict
+                self._sessions[session_id] = {**present, student_id: name}
+
+    def mark_absent(self, session_id, student_id):
+        with self._lock:
+            self._generation += 1
+            present = self._sessions.get(session_id)
+            if present is not None and student_id in present:
+                present = dict(present)
+                del present[student_id]
+                self._sessions[session_id] = present
+
+    def invalidate(self, session_id=None):
+        with self._lock:
+            self._generation += 1
+            if session_id is None:
+                self._sessions.clear()
+                self._loaded_at.clear()
+            else:
+                self._sessions.pop(session_id, None)
+                self._loaded_at.pop(session_id, None)
+
+    def _load(self, session_id):
+        from .models import Attendance
+
+        return dict(
+            Attendance.objects.filter(
+                session_id=session_id,
+                status='present'
+            ).values_list('student_id', 'student__name')
+        )
+
+
+session_presence = SessionPresenceCache()
@@ -0,0 +1,115 @@
+import csv
+import json
+from datetime import date
+
+from django.db.models import Q
+
+
+REPORT_PAGE_SIZE = 100
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_FIELDS = [
+    ('session__session_date', 'date'),
+    ('session__session_time', 'time'),
+    ('session__course__course_code', 'course'),
+    ('session__session_type', 'session_type'),
+    ('student__registration_number', 'registration_number'),
+    ('student__name', 'student'),
+    ('status', 'status'),
+    ('marked_by', 'marked_by'),
+    ('confidence_score', 'confidence'),
+    ('marked_at', 'marked_at'),
+]
+
+
+def filter_attendances(attendances, course_id='', student_id='', date_from='', date_to=''):
+    """Apply the report filters shared by the HTML report and the exports"""
+    if course_id:
+        attendances = attendances.filter(session__course_id=course_id)
+    if student_id:
+        attendances = attendances.filter(student_id=student_id)
+    if date_from:
+        attendances = attendances.filter(session__session_date__gte=date_from)
+    if date_to:
+        attendances = attendances.filter(session__session_date__lte=date_to)
+    return attendances
+
+
+def encode_cursor(attendance):
+    return f'{attendance.session.session_date.isoformat()}_{attendance.id}'
+
+
+def decode_cursor(cursor):
+    try:
+        session_date, attendance_id = cursor.split('_')
+        return date.fromisoformat(session_date), int(attendance_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def keyset_page(attendances, after=None, before=None, page_size=REPORT_PAGE_SIZE):
+    """One page of attendances, newest session first, keyed on (session_date, id).
+
+    `after` continues past the last row of the previous page and `before`
+    goes back from the first row of the next one, so no page reads and
+    discards the rows before it as OFFSET does. The order spans the session
+    and attendance tables, so no index covers it: SQLite still sorts the
+    filtered rows past the cursor for every page. Narrow the report with
+    filters when it grows large.
+    Returns (rows, next_cursor, previous_cursor).
+    """
+    after = decode_cursor(after) if after else None
+    before = decode_cursor(before) if before else None
+
+    if before:
+        session_date, attendance_id = before
+        rows = list(attendances.filter(
+            Q(session__session_date__gt=session_date)
+            | Q(session__session_date=session_date, id__gt=attendance_id)
+        ).order_by('session__session_date', 'id')[:page_size + 1])
+        has_previous = len(rows) > page_size
+        rows = rows[:page_size][::-1]
+        has_next = True
+    else:
+        if after:
+            session_date, attendance_id = after
+            attendances = attendances.filter(
+                Q(session__session_date__lt=session_date)
+                | Q(session__session_date=session_date, id__lt=attendance_id)
+            )
+        rows = list(attendances.order_by('-session__session_date', '-id')[:page_size + 1])
+        has_next = len(rows) > page_size
+        rows = rows[:page_size]
+        has_previous = after is not None
+
+    next_cursor = encode_cursor(rows[-1]) if rows and has_next else None
+    previous_cursor = encode_cursor(rows[0]) if rows and has_previous else None
+    return rows, next_cursor, previous_cursor
+
+
+def export_rows(attendances):
+    """Yield report rows as tuples, reading the database in fixed-size chunks"""
+    rows = attendances.order_by('-session__session_date', '-id').values_list(
+        *[field for field, _ in EXPORT_FIELDS]
+    )
+    return rows.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+class Echo:
+    """File-like object whose write() hands the line back instead of buffering it"""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(attendances):
+    writer = csv.writer(Echo())
+    yield writer.writerow([name for _, name in EXPORT_FIELDS])
+    for row in export_rows(attendances):
+        yield writer.writerow(row)
+
+
+def stream_jsonl(attendances):
+    names = [name for _, name in EXPORT_FIELDS]
+    for row in export_rows(attendances):
+        yield json.dumps(dict(zip(names, row)), default=str) + '\n'
@@ -0,0 +1,98 @@
+from datetime import timedelta
+
+from django.db import transaction
+
+from .models import Student, AttendanceSession, Attendance
+from .summary import invalidate_summary
+
+
+WEEKDAY_CHOICES = [
+    (0, 'Monday'),
+    (1, 'Tuesday'),
+    (2, 'Wednesday'),
+    (3, 'Thursday'),
+    (4, 'Friday'),
+    (5, 'Saturday'),
+    (6, 'Sunday'),
+]
+
+
+def create_attendance_records(sessions, batch_size=500):
+    """Bulk-insert an 'absent' row for every active student of each session's course"""
+    course_ids = {session.course_id for session in sessions}
+    students_by_course = {}
+    for student_id, course_id in Student.objects.filter(
+        course_id__in=course_ids, is_active=True
+    ).values_list('id', 'course_id'):
+        students_by_course.setdefault(course_id, []).append(student_id)
+
+    records = [
+        Attendance(session=session, student_id=student_id, status='absent', marked_by='system')
+        for session in sessions
+        for student_id in students_by_course.get(session.course_id, [])
+    ]
+    Attendance.objects.bulk_create(records, batch_size=batch_size)
+    return len(records)
+
+
+def create_session(session):
+    """Save a new session and its attendance rows in one transaction"""
+    with transaction.atomic():
+        session.save()
+        create_attendance_records([session])
+    return session
+
+
+def recurring_session_dates(start_date, end_date, weekdays):
+    weekdays = set(weekdays)
+    day = start_date
+    while day <= end_date:
+        if day.weekday() in weekdays:
+            yield day
+        day += timedelta(days=1)
+
+
+def create_recurring_sessions(course, start_date, end_date, weekdays, session_time,
+                              session_type='lecture', faculty=None):
+    """Create one session per matching weekday between start_date and end_date.
+
+    Slots that already have a session for this course (unique_together on
+    course, date and time) are skipped and returned as conflicts.
+    Returns (created_sessions, conflicting_dates).
+    """
+    existing = set(
+        AttendanceSession.objects.filter(
+            course=course,
+            session_time=session_time,
+            session_date__range=(start_date, end_date),
+        ).values_list('session_date', flat=True)
+    )
+
+    new_sessions = []
+    conflicts = []
+    for session_date in recurring_session_dates(start_date, end_date, weekdays):
+        if session_date in existing:
+            conflicts.append(session_date)
+            continue
+        new_sessions.append(AttendanceSession(
+            course=course,
+            faculty=faculty,
+            session_date=session_date,
+            session_time=session_time,
+            session_type=session_type,
+        ))
+
+    with transaction.atomic():
+        created = AttendanceSession.objects.bulk_create(new_sessions)
+        if created and created[0].pk is None:
+            # Backends that cannot return ids from a bulk insert: read them back
+            created = list(AttendanceSession.objects.filter(
+                course=course,
+                session_time=session_time,
+                session_date__in=[session.session_date for session in new_sessions],
+            ))
+        create_attendance_records(created)
+        # bulk_create sends no post_save, so drop the cached dashboard figures explicitly
+        transaction.on_commit(invalidate_summary)
+
+    return created, conflicts
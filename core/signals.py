@@ -1,22 +1,104 @@
-from django.db.models.signals import post_save
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from .models import Student
+from .models import Student, Course, AttendanceSession, Attendance
 from .face_recognition_utils import get_face_service
+from .gallery_cache import gallery_cache
+from .face_index import student_index
+from .encoding_jobs import enqueue_encoding
+from .presence import session_presence
+from .summary import invalidate_summary, COUNTS, RECENT_SESSIONS, LOW_ATTENDANCE
 
 
 @receiver(post_save, sender=Student)
-def generate_face_encoding(sender, instance, created, **kwargs):
+def generate_face_encoding(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is not None and 'photo' not in update_fields:
+        return
     if instance.photo and not instance.face_encoding:
+        if getattr(settings, 'FACE_ENCODING_BACKGROUND', False):
+            # Picked up by manage.py encoding_worker
+            transaction.on_commit(lambda: enqueue_encoding(instance))
+            return
         try:
             face_service = get_face_service()
             encoding = face_service.encode_face(instance.photo.path)
             
             if encoding:
+                instance.face_encoding = face_service.encoding_to_bytes(encoding)
+                instance.encoding_status = 'ready'
+                instance.encoding_version = face_service.encoding_version
                 Student.objects.filter(pk=instance.pk).update(
-                    face_encoding=face_service.encoding_to_string(encoding)
+                    face_encoding=instance.face_encoding,
+                    encoding_status='ready',
+                    encoding_version=instance.encoding_version
                 )
                 print(f"Face encoding generated for {instance.name}")
             else:
                 print(f"No face detected for {instance.name}")
         except Exception as e:
             print(f"Error generating face encoding: {str(e)}")
+
+
+@receiver(post_save, sender=Student)
+def update_gallery_cache(sender, instance, **kwargs):
+    transaction.on_commit(lambda: gallery_cache.update_student(instance))
+
+
+@receiver(post_delete, sender=Student)
+def remove_from_gallery_cache(sender, instance, **kwargs):
+    student_id = instance.pk
+    transaction.on_commit(lambda: gallery_cache.remove_student(student_id))
+
+
+# Fields that decide whether and how a student is in the index
+STUDENT_INDEX_FIELDS = {'face_encoding', 'encoding_version', 'is_active'}
+
+
+@receiver(post_save, sender=Student)
+def update_student_index(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not STUDENT_INDEX_FIELDS & set(update_fields):
+        return
+    encodings = None
+    if instance.has_current_encoding:
+        encodings = get_face_service().bytes_to_encodings(instance.face_encoding)
+    transaction.on_commit(lambda: student_index.update_student(instance, encodings))
+
+
+@receiver(post_delete, sender=Student)
+def remove_from_student_index(sender, instance, **kwargs):
+    student_id = instance.pk
+    transaction.on_commit(lambda: student_index.remove_student(student_id))
+
+
+@receiver(post_save, sender=Attendance)
+def update_session_presence(sender, instance, **kwargs):
+    session_id, student_id = instance.session_id, instance.student_id
+    if instance.status == 'present':
+        name = instance.student.name
+        transaction.on_commit(lambda: session_presence.mark_present(session_id, student_id, name))
+    else:
+        transaction.on_commit(lambda: session_presence.mark_absent(session_id, student_id))
+
+
+@receiver(post_delete, sender=Attendance)
+def remove_from_session_presence(sender, instance, **kwargs):
+    session_id, student_id = instance.session_id, instance.student_id
+    transaction.on_commit(lambda: session_presence.mark_absent(session_id, student_id))
+
+
+# Which cached home/dashboard figures each model feeds
+SUMMARY_DEPENDENCIES = {
+    Student: (COUNTS, LOW_ATTENDANCE),
+    Course: (COUNTS, RECENT_SESSIONS),
+    AttendanceSession: (COUNTS, RECENT_SESSIONS, LOW_ATTENDANCE),
+    Attendance: (LOW_ATTENDANCE,),
+}
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidate_summary_cache(sender, **kwargs):
+    parts = SUMMARY_DEPENDENCIES.get(sender)
+    if parts:
+        transaction.on_commit(lambda: invalidate_summary(*parts))
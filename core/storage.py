@@ -0,0 +1,115 @@
+import hashlib
+import os
+import posixpath
+from functools import lru_cache
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from PIL import Image, ImageOps
+
+
+THUMBNAIL_DIR = 'thumbnails'
+
+
+def compress_image(data, max_size, quality, image=None):
+    """Re-encode image bytes as a JPEG no larger than max_size on its longest side.
+
+    Returns None when the bytes are not a readable image. An already small
+    JPEG is kept as is when re-encoding would not make it smaller. image may
+    be data already decoded (and EXIF-rotated) by the caller; it is not modified.
+    """
+    if image is None:
+        try:
+            image = Image.open(BytesIO(data))
+            source_format = image.format
+            image = ImageOps.exif_transpose(image)
+        except (OSError, ValueError, Image.DecompressionBombError):
+            return None
+    else:
+        source_format = 'JPEG' if data[:2] == b'\xff\xd8' else None
+
+    resized = max(image.size) > max_size
+    if resized:
+        image = image.copy()
+        image.thumbnail((max_size, max_size), Image.LANCZOS)
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    output = BytesIO()
+    image.save(output, format='JPEG', quality=quality, optimize=True)
+    compressed = output.getvalue()
+    if source_format == 'JPEG' and not resized and len(compressed) >= len(data):
+        return data
+    return compressed
+
+
+class PhotoStorage(FileSystemStorage):
+    """Media storage for face photos: recompressed and content-addressed.
+
+    Every saved photo is re-encoded to a bounded JPEG and stored under the
+    hash of its original bytes (<upload_to>/<ab>/<hash>.jpg), so saving the
+    same image twice reuses the existing file instead of writing a copy.
+    """
+
+    def __init__(self, max_size=None, quality=None, **kwargs):
+        super().__init__(**kwargs)
+        self.max_size = max_size or getattr(settings, 'PHOTO_MAX_SIZE', 1280)
+        self.quality = quality or getattr(settings, 'PHOTO_JPEG_QUALITY', 85)
+
+    def _save(self, name, content):
+        content.seek(0)
+        data = content.read()
+        digest = hashlib.sha256(data).hexdigest()[:40]
+
+        hashed_name = self._hashed_name(name, digest, '.jpg')
+        if self.exists(hashed_name):
+            return hashed_name
+
+        # A view that has already decoded the upload leaves the picture on it
+        compressed = compress_image(
+            data, self.max_size, self.quality, image=getattr(content, 'decoded_image', None)
+        )
+        if compressed is None:
+            # Not an image PIL can read: keep the bytes and the original extension
+            compressed = data
+            hashed_name = self._hashed_name(name, digest, os.path.splitext(name)[1].lower())
+            if self.exists(hashed_name):
+                return hashed_name
+        return super()._save(hashed_name, ContentFile(compressed))
+
+    def _hashed_name(self, name, digest, extension):
+        return posixpath.join(posixpath.dirname(name), digest[:2], digest + extension)
+
+
+photo_storage = PhotoStorage()
+thumbnail_storage = FileSystemStorage()
+
+
+def get_photo_storage():
+    return photo_storage
+
+
+def thumbnail_name(name, size):
+    return posixpath.join(THUMBNAIL_DIR, str(size), posixpath.splitext(name)[0] + '.jpg')
+
+
+@lru_cache(maxsize=4096)
+def get_thumbnail_url(storage, name, size):
+    """URL of a JPEG thumbnail (at most size x size) of a stored photo.
+
+    The thumbnail is generated on first use and then served from storage;
+    the lookup itself is cached so later calls do not touch the disk.
+    """
+    thumb_name = thumbnail_name(name, size)
+    if not thumbnail_storage.exists(thumb_name):
+        with storage.open(name, 'rb') as f:
+            image = ImageOps.exif_transpose(Image.open(f))
+            image.thumbnail((size, size), Image.LANCZOS)
+            if image.mode != 'RGB':
+                image = image.convert('RGB')
+            output = BytesIO()
+            image.save(output, format='JPEG', quality=80, optimize=True)
+        thumb_name = thumbnail_storage.save(thumb_name, ContentFile(output.getvalue()))
+    return thumbnail_storage.url(thumb_name)
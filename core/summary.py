@@ -0,0 +1,93 @@
+import threading
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import Student, Course, AttendanceSession
+
+
+LOW_ATTENDANCE_THRESHOLD = 75
+SUMMARY_TIMEOUT = 300  # safety net; entries are normally dropped by signals first
+
+COUNTS = 'counts'
+RECENT_SESSIONS = 'recent_sessions'
+LOW_ATTENDANCE = 'low_attendance'
+
+_stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+_stats_lock = threading.Lock()
+
+
+def _key(part):
+    if part == COUNTS:
+        # Today's session count rolls over at midnight with the key
+        return f'summary:{COUNTS}:{timezone.now().date().isoformat()}'
+    return f'summary:{part}'
+
+
+def _count(stat, n=1):
+    with _stats_lock:
+        _stats[stat] += n
+
+
+def _cached(part, compute):
+    value = cache.get(_key(part))
+    if value is not None:
+        _count('hits')
+        return value
+    _count('misses')
+    value = compute()
+    cache.set(_key(part), value, SUMMARY_TIMEOUT)
+    return value
+
+
+def _counts():
+    return {
+        'total_students': Student.objects.filter(is_active=True).count(),
+        'total_courses': Course.objects.count(),
+        'today_sessions': AttendanceSession.objects.filter(
+            session_date=timezone.now().date()
+        ).count(),
+    }
+
+
+def _recent_sessions():
+    return list(AttendanceSession.objects.select_related(
+        'course', 'faculty'
+    ).order_by('-session_date', '-session_time')[:5])
+
+
+def _low_attendance():
+    return list(Student.objects.filter(
+        is_active=True
+    ).with_attendance_percentage().filter(
+        attendance_percentage__lt=LOW_ATTENDANCE_THRESHOLD
+    ).order_by('attendance_percentage', 'name').values(
+        'id', 'name', 'registration_number', 'attendance_percentage'
+    ))
+
+
+def get_counts():
+    return _cached(COUNTS, _counts)
+
+
+def get_recent_sessions():
+    return _cached(RECENT_SESSIONS, _recent_sessions)
+
+
+def get_low_attendance_students():
+    return _cached(LOW_ATTENDANCE, _low_attendance)
+
+
+def invalidate_summary(*parts):
+    """Drop cached summary figures; with no arguments, all of them"""
+    parts = parts or (COUNTS, RECENT_SESSIONS, LOW_ATTENDANCE)
+    cache.delete_many([_key(part) for part in parts])
+    _count('invalidations', len(parts))
+
+
+def summary_cache_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else None
+    return stats
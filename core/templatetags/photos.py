@@ -0,0 +1,16 @@
+from django import template
+
+from core.storage import get_thumbnail_url
+
+register = template.Library()
+
+
+@register.filter
+def thumbnail(photo, size=100):
+    """{{ student.photo|thumbnail:100 }} - URL of a cached thumbnail, falling back to the photo"""
+    if not photo:
+        return ''
+    try:
+        return get_thumbnail_url(photo.storage, photo.name, int(size))
+    except (OSError, ValueError):
+        return photo.url
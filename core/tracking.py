@@ -0,0 +1,78 @@
+import itertools
+
+
+def box_iou(a, b):
+    """Intersection over union of two (top, right, bottom, left) boxes."""
+    top, right = max(a[0], b[0]), min(a[1], b[1])
+    bottom, left = min(a[2], b[2]), max(a[3], b[3])
+    if right <= left or bottom <= top:
+        return 0.0
+    intersection = (right - left) * (bottom - top)
+    area_a = (a[1] - a[3]) * (a[2] - a[0])
+    area_b = (b[1] - b[3]) * (b[2] - b[0])
+    return intersection / float(area_a + area_b - intersection)
+
+
+class Track:
+
+    def __init__(self, track_id, box, frame):
+        self.track_id = track_id
+        self.box = box
+        self.last_frame = frame
+        self.student_id = None
+        self.confidence = 0
+        self.status = None
+        self.attempts = 0
+
+
+class FaceTracker:
+    """Follows face boxes across consecutive frames by overlap.
+
+    update() returns the tracks that still need identifying, so encoding and
+    matching only run when a face first appears (or has not been recognized
+    yet), not on every frame.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_missed_frames=10, max_attempts=3):
+        self.iou_threshold = iou_threshold
+        self.max_missed_frames = max_missed_frames
+        self.max_attempts = max_attempts
+        self.tracks = []
+        self.frame = 0
+        self._ids = itertools.count(1)
+
+    def update(self, boxes):
+        self.frame += 1
+        unmatched = list(range(len(boxes)))
+
+        # Greedy matching, best-overlapping pairs first
+        pairs = sorted(
+            ((box_iou(track.box, boxes[i]), track, i) for track in self.tracks for i in unmatched),
+            key=lambda pair: pair[0],
+            reverse=True,
+        )
+        matched_tracks = set()
+        for iou, track, i in pairs:
+            if iou < self.iou_threshold:
+                break
+            if track.track_id in matched_tracks or i not in unmatched:
+                continue
+            track.box = boxes[i]
+            track.last_frame = self.frame
+            matched_tracks.add(track.track_id)
+            unmatched.remove(i)
+
+        for i in unmatched:
+            self.tracks.append(Track(next(self._ids), boxes[i], self.frame))
+
+        self.tracks = [
+            track for track in self.tracks
+            if self.frame - track.last_frame <= self.max_missed_frames
+        ]
+
+        return [
+            track for track in self.tracks
+            if track.last_frame == self.frame
+            and track.student_id is None
+            and track.attempts < self.max_attempts
+        ]
@@ -4,6 +4,7 @@ from . import views
 urlpatterns = [
     path('', views.home, name='home'),
     path('dashboard/', views.dashboard, name='dashboard'),
+    path('dashboard/cache-stats/', views.dashboard_cache_stats, name='dashboard_cache_stats'),
     
     path('students/', views.student_list, name='student_list'),
     path('students/register/', views.student_register, name='student_register'),
@@ -14,8 +15,14 @@ urlpatterns = [
         path('webcam/', views.webcam, name='webcam'),
     path('sessions/', views.session_list, name='session_list'),
     path('sessions/create/', views.session_create, name='session_create'),
+    path('sessions/create/recurring/', views.session_create_recurring, name='session_create_recurring'),
     path('sessions/<int:session_id>/mark/', views.mark_attendance, name='mark_attendance'),
     path('sessions/<int:session_id>/mark/manual/', views.mark_attendance_manual, name='mark_attendance_manual'),
     path('sessions/<int:session_id>/mark/face/', views.mark_attendance_face, name='mark_attendance_face'),
+    path('sessions/<int:session_id>/kiosk/', views.kiosk, name='kiosk'),
+    path('sessions/<int:session_id>/recognize/', views.recognize_face, name='recognize_face_session'),
+    path('recognize/', views.recognize_face, name='recognize_face'),
     path('reports/attendance/', views.attendance_report, name='attendance_report'),
+    path('reports/attendance/export/', views.attendance_export, name='attendance_export'),
+    path('metrics', views.metrics, name='metrics'),
 ]
@@ -1,16 +1,35 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
+from django.core.exceptions import RequestDataTooBig
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.utils import timezone
+from django.db import transaction
 from django.db.models import Count, Q
 from .models import Student, Course, AttendanceSession, Attendance
 from .forms import (
     StudentRegistrationForm, CourseForm, AttendanceSessionForm,
-    FaceRecognitionUploadForm, ManualAttendanceForm
+    FaceRecognitionUploadForm, ManualAttendanceForm, RecurringSessionForm
 )
 from .face_recognition_utils import get_face_service
+from .face_pool import FacePoolBusy
+from .gallery_cache import get_course_gallery
+from .presence import session_presence
+from .face_index import student_index
+from .scheduling import create_session, create_recurring_sessions
+from .marking import apply_manual_attendance, mark_face_attendance
+from .storage import photo_storage
+from .metrics import registry, stage
+from .summary import (
+    get_counts, get_recent_sessions, get_low_attendance_students, summary_cache_stats,
+    invalidate_summary, LOW_ATTENDANCE
+)
+from .reports import filter_attendances, keyset_page, stream_csv, stream_jsonl
 import json
+import numpy as np
+
 
 from django.shortcuts import render
 
@@ -18,12 +37,8 @@ def webcam(request):
     return render(request,'core/webcam.html')
 def home(request):
     context = {
-        'total_students': Student.objects.filter(is_active=True).count(),
-        'total_courses': Course.objects.count(),
-        'today_sessions': AttendanceSession.objects.filter(
-            session_date=timezone.now().date()
-        ).count(),
-        'recent_sessions': AttendanceSession.objects.all()[:5],
+        **get_counts(),
+        'recent_sessions': get_recent_sessions(),
     }
     return render(request, 'core/home.html', context)
 
@@ -42,6 +57,9 @@ def student_list(request):
     if course_id:
         students = students.filter(course_id=course_id)
     
+    # One annotated query; percentages are course-specific when filtering by course
+    students = students.with_attendance_percentage(course=course_id or None)
+    
     courses = Course.objects.all()
     
     context = {
@@ -56,80 +74,137 @@ def student_list(request):
 def student_register(request):
     if request.method == 'POST':
         captured_image_data = request.POST.get('captured_image_data', '')
+        files = request.FILES
         
         if captured_image_data:
             import base64
-            from io import BytesIO
-            from django.core.files.uploadedfile import InMemoryUploadedFile
-            import sys
-            from PIL import Image as PILImage
-            image_data = captured_image_data.split(',')[1]
-            image_bytes = base64.b64decode(image_data)
-            image = PILImage.open(BytesIO(image_bytes))
-            output = BytesIO()
-            image.save(output, format='JPEG', quality=90)
-            output.seek(0)
+            from django.core.files.uploadedfile import SimpleUploadedFile
             
-            # Create a file object
-            photo_file = InMemoryUploadedFile(
-                output,
-                'ImageField',
-                f'student_{timezone.now().strftime("%Y%m%d_%H%M%S")}.jpg',
-                'image/jpeg',
-                sys.getsizeof(output),
-                None
-            )
-            
-            # Create a mutable copy of POST data
-            post_data = request.POST.copy()
-            post_data['photo'] = photo_file
-            
-            # Create form with captured image
-            form = StudentRegistrationForm(post_data, {'photo': photo_file})
-        else:
-            form = StudentRegistrationForm(request.POST, request.FILES)
+            # The capture is already a JPEG; it is decoded once, in _register_student
+            with stage('base64_decode'):
+                image_bytes = base64.b64decode(captured_image_data.split(',')[-1])
+            files = {'photo': SimpleUploadedFile(
+                f'student_{timezone.now().strftime("%Y%m%d_%H%M%S")}.jpg', image_bytes, 'image/jpeg'
+            )}
+        
+        form = StudentRegistrationForm(request.POST, files)
         
         if form.is_valid():
             student = form.save(commit=False)
             
-            # Handle captured image
-            if captured_image_data and not student.photo:
-                import base64
-                from io import BytesIO
-                from django.core.files.base import ContentFile
-                from PIL import Image as PILImage
-                
-                # Remove the data URL prefix
-                image_data = captured_image_data.split(',')[1]
-                image_bytes = base64.b64decode(image_data)
-                
-                # Save the image
-                student.photo.save(
-                    f'student_{student.registration_number}_{timezone.now().strftime("%Y%m%d_%H%M%S")}.jpg',
-                    ContentFile(image_bytes),
-                    save=False
-                )
-            
-            # Generate face encoding
             if student.photo:
-                student.save()  # Save first to get the file path
-                face_service = get_face_service()
-                encoding = face_service.encode_face(student.photo.path)
-                
-                if encoding:
-                    student.face_encoding = face_service.encoding_to_string(encoding)
-                    student.save()
-                    messages.success(request, f'Student {student.name} registered successfully with face recognition!')
-                    return redirect('student_list')
-                else:
-                    messages.error(request, 'No face detected in the captured photo. Please try again with a clearer image.')
-                    student.delete()  # Remove student if face encoding fails
+                response = _register_student(request, student, _read_enrollment_frames(request))
+                if response:
+                    return response
             else:
                 messages.error(request, 'Please capture your face photo.')
     else:
         form = StudentRegistrationForm()
     
-    return render(request, 'core/student_register.html', {'form': form})
+    return render(request, 'core/student_register.html', {
+        'form': form,
+        'extra_frames': _templates_per_student() - 1,
+    })
+
+
+def _templates_per_student():
+    return max(1, getattr(settings, 'FACE_TEMPLATES_PER_STUDENT', 1))
+
+
+def _read_enrollment_frames(request):
+    """Extra webcam frames captured after the photo, as a list of image bytes"""
+    import base64
+    
+    try:
+        data_urls = json.loads(request.POST.get('enrollment_frames') or '[]')
+    except ValueError:
+        return []
+    if not isinstance(data_urls, list):
+        return []
+    
+    frames = []
+    for data_url in data_urls[:_templates_per_student() - 1]:
+        try:
+            frames.append(base64.b64decode(str(data_url).split(',')[-1]))
+        except ValueError:
+            continue
+    return frames
+
+
+def _register_student(request, student, enrollment_frames):
+    """Encode the photo and any extra frames, then save the student once.
+    
+    The photo is decoded once: the same image is used for detection, encoding
+    and the stored copy. Nothing is written until the face has been found and
+    every template checked for duplicates. Returns a redirect on success, or
+    None after adding an error message.
+    """
+    if getattr(settings, 'FACE_ENCODING_BACKGROUND', False) and not enrollment_frames:
+        # post_save queues the only encoding for manage.py encoding_worker
+        student.encoding_status = 'pending'
+        student.save()
+        messages.success(request, f'Student {student.name} registered! Face encoding is pending and will be ready shortly.')
+        return redirect('student_list')
+    
+    face_service = get_face_service()
+    upload = student.photo.file
+    upload.seek(0)
+    try:
+        image = face_service.load_image(upload.read())
+    except (OSError, ValueError):
+        messages.error(request, 'The captured photo could not be read. Please try again.')
+        return None
+    # PhotoStorage compresses this image instead of decoding the upload again
+    upload.decoded_image = image
+    
+    encoding = face_service.encode_image(image)
+    if not encoding:
+        messages.error(request, 'No face detected in the captured photo. Please try again with a clearer image.')
+        return None
+    
+    # Frames where no face is found are simply left out, and so are frames of
+    # someone else, so one enrollment cannot mix two people's templates
+    frame_templates = [
+        template for template in map(face_service.encode_face_from_bytes, enrollment_frames)
+        if template
+    ]
+    # Compared with NumPy: compare_faces would import dlib into this web process
+    templates = [encoding] + [
+        template for template in frame_templates
+        if np.linalg.norm(np.asarray(template) - np.asarray(encoding)) <= face_service.tolerance
+    ]
+    
+    for template in templates:
+        duplicate_ids = [
+            student_id for student_id, distance in student_index.search(template, k=1)
+            if distance <= face_service.tolerance
+        ]
+        if duplicate_ids:
+            existing = Student.objects.get(pk=duplicate_ids[0])
+            messages.error(request, f'This face is already registered as {existing.registration_number} - {existing.name}.')
+            return None
+    
+    mismatched = len(frame_templates) - (len(templates) - 1)
+    if mismatched:
+        messages.warning(
+            request,
+            f'{mismatched} enrollment frame(s) did not match the captured photo and were left out.'
+        )
+    
+    student.face_encoding = face_service.encoding_to_bytes(templates)
+    student.encoding_status = 'ready'
+    student.encoding_version = face_service.encoding_version
+    # face_encoding is already set, so post_save neither encodes again nor queues a job
+    student.save()
+    
+    if len(templates) > 1:
+        messages.success(
+            request,
+            f'Student {student.name} registered successfully with {len(templates)} face templates!'
+        )
+    else:
+        messages.success(request, f'Student {student.name} registered successfully with face recognition!')
+    return redirect('student_list')
 
 
 def student_detail(request, pk):
@@ -220,17 +295,9 @@ def session_create(request):
             session = form.save(commit=False)
             if request.user.is_authenticated:
                 session.faculty = request.user
-            session.save()
             
-            # Create attendance records for all students in the course
-            students = Student.objects.filter(course=session.course, is_active=True)
-            for student in students:
-                Attendance.objects.create(
-                    session=session,
-                    student=student,
-                    status='absent',
-                    marked_by='system'
-                )
+            # Session and its attendance rows are written in one transaction
+            create_session(session)
             
             messages.success(request, f'Attendance session created for {session.course.course_name}!')
             return redirect('mark_attendance', session_id=session.id)
@@ -240,6 +307,33 @@ def session_create(request):
     return render(request, 'core/session_create.html', {'form': form})
 
 
+def session_create_recurring(request):
+    """Create a semester of weekly sessions in one go"""
+    if request.method == 'POST':
+        form = RecurringSessionForm(request.POST)
+        if form.is_valid():
+            data = form.cleaned_data
+            created, conflicts = create_recurring_sessions(
+                course=data['course'],
+                start_date=data['start_date'],
+                end_date=data['end_date'],
+                weekdays=[int(day) for day in data['weekdays']],
+                session_time=data['session_time'],
+                session_type=data['session_type'],
+                faculty=request.user if request.user.is_authenticated else None,
+            )
+            
+            messages.success(request, f'{len(created)} sessions created for {data["course"].course_name}!')
+            if conflicts:
+                skipped = ', '.join(day.strftime('%d %b') for day in conflicts)
+                messages.warning(request, f'{len(conflicts)} sessions already existed and were skipped: {skipped}')
+            return redirect('session_list')
+    else:
+        form = RecurringSessionForm()
+    
+    return render(request, 'core/session_recurring.html', {'form': form})
+
+
 def mark_attendance(request, session_id):
     """Mark attendance for a session"""
     session = get_object_or_404(AttendanceSession, pk=session_id)
@@ -249,29 +343,41 @@ def mark_attendance(request, session_id):
         'session': session,
         'attendances': attendances,
         'summary': session.get_attendance_summary(),
+        'kiosk_available': _serves_websockets(request),
     }
     return render(request, 'core/mark_attendance.html', context)
 
 
+def _serves_websockets(request):
+    # The kiosk WebSocket is served by attendance_system.asgi only; runserver and WSGI servers cannot
+    return isinstance(request, ASGIRequest)
+
+
 def mark_attendance_manual(request, session_id):
     """Manually mark attendance"""
     session = get_object_or_404(AttendanceSession, pk=session_id)
     
     if request.method == 'POST':
-        present_student_ids = request.POST.getlist('students')
+        # Faculty tablets post {"students": [ids]} as JSON instead of the form
+        if request.content_type == 'application/json':
+            try:
+                payload = json.loads(request.body)
+                present_student_ids = [int(student_id) for student_id in payload.get('students', [])]
+            except (ValueError, TypeError, AttributeError):
+                return JsonResponse({'error': 'Expected {"students": [student ids]}'}, status=400)
+            
+            changed = apply_manual_attendance(session, present_student_ids)
+            return JsonResponse({'changed': changed, 'summary': session.get_attendance_summary()})
         
-        # Update attendance
-        attendances = Attendance.objects.filter(session=session)
-        for attendance in attendances:
-            if str(attendance.student.id) in present_student_ids:
-                attendance.status = 'present'
-                attendance.marked_by = 'faculty'
-            else:
-                attendance.status = 'absent'
-                attendance.marked_by = 'faculty'
-            attendance.save()
+        try:
+            present_student_ids = [int(student_id) for student_id in request.POST.getlist('students')]
+        except ValueError:
+            messages.error(request, 'Invalid student selection.')
+            return redirect('mark_attendance_manual', session_id=session.id)
         
-        messages.success(request, 'Attendance marked successfully!')
+        changed = apply_manual_attendance(session, present_student_ids)
+        
+        messages.success(request, f'Attendance marked successfully! {changed} records changed.')
         return redirect('mark_attendance', session_id=session.id)
     
     form = ManualAttendanceForm(course=session.course)
@@ -295,7 +401,8 @@ def mark_attendance_face(request, session_id):
             
             try:
                 image_data = captured_image_data.split(',')[1]
-                image_bytes = base64.b64decode(image_data)
+                with stage('base64_decode'):
+                    image_bytes = base64.b64decode(image_data)
                 
                 face_service = get_face_service()
                 uploaded_encoding = face_service.encode_face_from_bytes(image_bytes)
@@ -303,64 +410,43 @@ def mark_attendance_face(request, session_id):
                 if not uploaded_encoding:
                     messages.error(request, 'No face detected in the captured image. Please ensure your face is clearly visible and try again.')
                     return redirect('mark_attendance_face', session_id=session.id)
-                students = Student.objects.filter(
-                    course=session.course, 
-                    is_active=True
-                ).exclude(face_encoding='')
+                gallery = get_course_gallery(session.course_id)
                 
-                if not students.exists():
+                if not len(gallery):
                     messages.warning(request, 'No students with face encodings found for this course. Please ensure students have registered with face photos.')
                     return redirect('mark_attendance', session_id=session.id)
-                
-                student_encodings = {}
-                for student in students:
-                    encoding = face_service.string_to_encoding(student.face_encoding)
-                    if encoding:
-                        student_encodings[student.id] = encoding
-                
-                if not student_encodings:
-                    messages.warning(request, 'No valid face encodings found. Please ensure students have registered properly.')
-                    return redirect('mark_attendance', session_id=session.id)
                 matched_student_id, confidence = face_service.find_matching_student(
                     uploaded_encoding, 
-                    student_encodings
+                    gallery
                 )
                 
                 if matched_student_id:
-                    attendance = Attendance.objects.get(
-                        session=session, 
-                        student_id=matched_student_id
+                    status, student_name = mark_face_attendance(
+                        session,
+                        matched_student_id,
+                        confidence,
+                        image_bytes
                     )
-                    if attendance.status == 'present':
-                        student = Student.objects.get(id=matched_student_id)
+                    if status == 'already_present':
                         messages.info(
                             request, 
-                            f'Attendance already marked for {student.name}!'
+                            f'Attendance already marked for {student_name}!'
                         )
-                    else:
-                        attendance.status = 'present'
-                        attendance.marked_by = 'face_recognition'
-                        attendance.confidence_score = confidence
-                        attendance.marked_at = timezone.now()
-                        from django.core.files.base import ContentFile
-                        attendance.photo_captured.save(
-                            f'attendance_{session.id}_{matched_student_id}_{timezone.now().strftime("%Y%m%d_%H%M%S")}.jpg',
-                            ContentFile(image_bytes),
-                            save=False
-                        )
-                        attendance.save()
-                        
-                        student = Student.objects.get(id=matched_student_id)
+                    elif status == 'marked':
                         messages.success(
                             request, 
-                            f'✓ Attendance marked for {student.name} (Confidence: {confidence:.1f}%)'
+                            f'✓ Attendance marked for {student_name} (Confidence: {confidence:.1f}%)'
                         )
+                    else:
+                        messages.error(request, 'You are not on the attendance list for this session.')
                     
                     return redirect('mark_attendance', session_id=session.id)
                 else:
                     messages.error(request, 'Face not recognized. Please ensure you are registered for this course or try again with better lighting.')
                     return redirect('mark_attendance_face', session_id=session.id)
                     
+            except FacePoolBusy:
+                raise
             except Exception as e:
                 messages.error(request, f'Error processing image: {str(e)}. Please try again.')
                 return redirect('mark_attendance_face', session_id=session.id)
@@ -368,43 +454,36 @@ def mark_attendance_face(request, session_id):
             form = FaceRecognitionUploadForm(request.POST, request.FILES)
             if form.is_valid():
                 uploaded_image = form.cleaned_data['image']
+                if form.cleaned_data['group_photo']:
+                    return _mark_group_photo_attendance(request, session, uploaded_image)
                 face_service = get_face_service()
-                uploaded_encoding = face_service.encode_face_from_bytes(uploaded_image.read())
+                image_bytes = uploaded_image.read()
+                uploaded_encoding = face_service.encode_face_from_bytes(image_bytes)
                 
                 if not uploaded_encoding:
                     messages.error(request, 'No face detected in the uploaded image. Please try again.')
                     return redirect('mark_attendance_face', session_id=session.id)
-                students = Student.objects.filter(
-                    course=session.course, 
-                    is_active=True
-                ).exclude(face_encoding='')
-                
-                student_encodings = {}
-                for student in students:
-                    encoding = face_service.string_to_encoding(student.face_encoding)
-                    if encoding:
-                        student_encodings[student.id] = encoding
                 matched_student_id, confidence = face_service.find_matching_student(
                     uploaded_encoding, 
-                    student_encodings
+                    get_course_gallery(session.course_id)
                 )
                 
                 if matched_student_id:
-                    attendance = Attendance.objects.get(
-                        session=session, 
-                        student_id=matched_student_id
-                    )
-                    attendance.status = 'present'
-                    attendance.marked_by = 'face_recognition'
-                    attendance.confidence_score = confidence
-                    attendance.photo_captured = uploaded_image
-                    attendance.save()
-                    
-                    student = Student.objects.get(id=matched_student_id)
-                    messages.success(
-                        request, 
-                        f'Attendance marked for {student.name} (Confidence: {confidence}%)'
+                    status, student_name = mark_face_attendance(
+                        session,
+                        matched_student_id,
+                        confidence,
+                        image_bytes
                     )
+                    if status == 'already_present':
+                        messages.info(request, f'Attendance already marked for {student_name}!')
+                    elif status == 'marked':
+                        messages.success(
+                            request, 
+                            f'Attendance marked for {student_name} (Confidence: {confidence}%)'
+                        )
+                    else:
+                        messages.error(request, 'This student is not on the attendance list for this session.')
                 else:
                     messages.error(request, 'No matching student found. Please try again or mark manually.')
                 
@@ -419,6 +498,178 @@ def mark_attendance_face(request, session_id):
     return render(request, 'core/mark_attendance_face.html', context)
 
 
+def _mark_group_photo_attendance(request, session, uploaded_image):
+    """Mark every recognised student in a class photo present in one transaction"""
+    face_service = get_face_service()
+    uploaded_encodings = face_service.encode_faces_from_bytes(uploaded_image.read())
+    
+    if not uploaded_encodings:
+        messages.error(request, 'No faces detected in the group photo. Please try again.')
+        return redirect('mark_attendance_face', session_id=session.id)
+    
+    assignments = face_service.assign_faces(
+        uploaded_encodings,
+        get_course_gallery(session.course_id)
+    )
+    confidences = {student_id: confidence for _, student_id, confidence in assignments}
+    present = session_presence.get(session.id)
+    already_present = sum(1 for student_id in confidences if student_id in present)
+    
+    attendances = list(
+        Attendance.objects.select_related('student').filter(
+            session=session,
+            student_id__in=[student_id for student_id in confidences if student_id not in present]
+        )
+    )
+    already_present += sum(1 for attendance in attendances if attendance.status == 'present')
+    attendances = [attendance for attendance in attendances if attendance.status != 'present']
+    if attendances:
+        now = timezone.now()
+        uploaded_image.seek(0)
+        # Written before the transaction so file I/O never holds the database write lock
+        with stage('photo_save'):
+            photo_name = photo_storage.save(
+                f'attendance_photos/group_{session.id}_{now.strftime("%Y%m%d_%H%M%S")}_{uploaded_image.name}',
+                uploaded_image
+            )
+        for attendance in attendances:
+            attendance.status = 'present'
+            attendance.marked_by = 'face_recognition'
+            attendance.confidence_score = confidences[attendance.student_id]
+            attendance.marked_at = now
+            attendance.photo_captured.name = photo_name
+        with stage('db_write'), transaction.atomic():
+            # Drop students another kiosk marked since the read above
+            marked_meanwhile = set(Attendance.objects.filter(
+                id__in=[attendance.id for attendance in attendances], status='present'
+            ).values_list('id', flat=True))
+            if marked_meanwhile:
+                already_present += len(marked_meanwhile)
+                attendances = [attendance for attendance in attendances if attendance.id not in marked_meanwhile]
+            Attendance.objects.bulk_update(
+                attendances,
+                ['status', 'marked_by', 'confidence_score', 'marked_at', 'photo_captured']
+            )
+            # bulk_update sends no post_save, so drop the cached figures explicitly
+            transaction.on_commit(lambda: session_presence.invalidate(session.id))
+            transaction.on_commit(lambda: invalidate_summary(LOW_ATTENDANCE))
+    
+    unrecognized = len(uploaded_encodings) - len(assignments)
+    messages.success(
+        request,
+        f'Group photo: {len(attendances)} marked present, {already_present} already present, '
+        f'{unrecognized} of {len(uploaded_encodings)} faces not recognized.'
+    )
+    return redirect('mark_attendance', session_id=session.id)
+
+
+def kiosk(request, session_id):
+    """Continuous kiosk: streams camera frames over a WebSocket (needs an ASGI server)"""
+    session = get_object_or_404(AttendanceSession.objects.select_related('course'), pk=session_id)
+    if not _serves_websockets(request):
+        messages.error(request, 'Kiosk mode needs the ASGI server (attendance_system.asgi:application).')
+        return redirect('mark_attendance', session_id=session.id)
+    return render(request, 'core/kiosk.html', {'session': session})
+
+
+MAX_IMAGE_SIZE = 10 * 1024 * 1024
+# Base64 makes a data URL a third larger than the image it holds
+MAX_JSON_IMAGE_BODY = MAX_IMAGE_SIZE * 4 // 3 + 1024
+
+
+def _read_body(request, limit):
+    # request.body refuses anything over DATA_UPLOAD_MAX_MEMORY_SIZE (2.5 MB),
+    # below the size this endpoint accepts, so the stream is read directly
+    if int(request.META.get('CONTENT_LENGTH') or 0) > limit:
+        raise RequestDataTooBig()
+    body = request.read(limit + 1)
+    if len(body) > limit:
+        raise RequestDataTooBig()
+    return body
+
+
+def _read_image_bytes(request):
+    """Image from a raw body, a multipart 'image' file or a JSON data URL.
+    
+    Raises RequestDataTooBig for an image over MAX_IMAGE_SIZE.
+    """
+    content_type = request.content_type or ''
+    
+    if content_type.startswith('image/') or content_type == 'application/octet-stream':
+        return _read_body(request, MAX_IMAGE_SIZE)
+    if content_type == 'multipart/form-data':
+        uploaded = request.FILES.get('image')
+        if uploaded and uploaded.size > MAX_IMAGE_SIZE:
+            raise RequestDataTooBig()
+        return uploaded.read() if uploaded else None
+    if content_type == 'application/json':
+        import base64
+        
+        try:
+            data_url = json.loads(_read_body(request, MAX_JSON_IMAGE_BODY)).get('image', '')
+            if not data_url:
+                return None
+            with stage('base64_decode'):
+                image_bytes = base64.b64decode(data_url.split(',')[-1])
+        except (ValueError, AttributeError):
+            return None
+        if len(image_bytes) > MAX_IMAGE_SIZE:
+            raise RequestDataTooBig()
+        return image_bytes
+    return None
+
+
+def recognize_face(request, session_id=None):
+    """JSON recognition endpoint for kiosks: one POST, one JSON answer"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST required'}, status=405)
+    
+    session = None
+    if session_id is not None:
+        session = get_object_or_404(AttendanceSession.objects.select_related('course'), pk=session_id)
+    
+    try:
+        image_bytes = _read_image_bytes(request)
+    except RequestDataTooBig:
+        return JsonResponse({'status': 'error', 'error': 'Image file size should not exceed 10MB'}, status=413)
+    if not image_bytes:
+        return JsonResponse({'status': 'error', 'error': 'No image provided'}, status=400)
+    
+    face_service = get_face_service()
+    uploaded_encoding = face_service.encode_face_from_bytes(image_bytes)
+    if not uploaded_encoding:
+        return JsonResponse({'status': 'no_face', 'matched': False})
+    
+    if session is None:
+        # No session: identify against every active student without marking anything
+        matches = student_index.search(uploaded_encoding, k=1)
+        if not matches or matches[0][1] > face_service.tolerance:
+            return JsonResponse({'status': 'not_recognized', 'matched': False})
+        matched_student_id, distance = matches[0]
+        confidence = round((1 - distance) * 100, 2)
+        status = 'identified'
+    else:
+        matched_student_id, confidence = face_service.find_matching_student(
+            uploaded_encoding,
+            get_course_gallery(session.course_id)
+        )
+        if not matched_student_id:
+            return JsonResponse({'status': 'not_recognized', 'matched': False})
+        status, _ = mark_face_attendance(session, matched_student_id, confidence, image_bytes)
+    
+    student = Student.objects.only('id', 'name', 'registration_number').get(pk=matched_student_id)
+    return JsonResponse({
+        'status': status,
+        'matched': True,
+        'confidence': confidence,
+        'student': {
+            'id': student.id,
+            'name': student.name,
+            'registration_number': student.registration_number,
+        },
+    })
+
+
 def attendance_report(request):
     courses = Course.objects.all()
     students = Student.objects.filter(is_active=True)
@@ -426,29 +677,40 @@ def attendance_report(request):
     student_id = request.GET.get('student', '')
     date_from = request.GET.get('date_from', '')
     date_to = request.GET.get('date_to', '')
-    attendances = Attendance.objects.select_related(
-        'student', 'session', 'session__course'
+    attendances = filter_attendances(
+        Attendance.objects.select_related('student', 'session', 'session__course'),
+        course_id, student_id, date_from, date_to
     )
     
     if course_id:
-        attendances = attendances.filter(session__course_id=course_id)
         students = students.filter(course_id=course_id)
     
-    if student_id:
-        attendances = attendances.filter(student_id=student_id)
-    
-    if date_from:
-        attendances = attendances.filter(session__session_date__gte=date_from)
+    page, next_cursor, previous_cursor = keyset_page(
+        attendances,
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
     
-    if date_to:
-        attendances = attendances.filter(session__session_date__lte=date_to)
+    filters = request.GET.copy()
+    filters.pop('after', None)
+    filters.pop('before', None)
     
-    attendances = attendances.order_by('-session__session_date')
+    # Counted on the first page only and carried in the page links, so paging
+    # does not count the whole filtered report again
+    try:
+        total_records = int(filters['total'])
+    except (KeyError, ValueError):
+        total_records = attendances.count() if page else 0
+        filters['total'] = total_records
     
     context = {
         'courses': courses,
         'students': students,
-        'attendances': attendances,
+        'attendances': page,
+        'total_records': total_records,
+        'next_cursor': next_cursor,
+        'previous_cursor': previous_cursor,
+        'filter_query': filters.urlencode(),
         'selected_course': course_id,
         'selected_student': student_id,
         'date_from': date_from,
@@ -457,30 +719,49 @@ def attendance_report(request):
     return render(request, 'core/attendance_report.html', context)
 
 
-def dashboard(request):
-    total_students = Student.objects.filter(is_active=True).count()
-    total_courses = Course.objects.count()
-    today_sessions = AttendanceSession.objects.filter(
-        session_date=timezone.now().date()
-    ).count()
-    recent_sessions = AttendanceSession.objects.select_related(
-        'course', 'faculty'
-    ).order_by('-session_date', '-session_time')[:5]
-    
-    low_attendance_students = []
-    for student in Student.objects.filter(is_active=True)[:10]:
-        percentage = student.get_attendance_percentage()
-        if percentage < 75:
-            low_attendance_students.append({
-                'student': student,
-                'percentage': percentage
-            })
+def attendance_export(request):
+    """Stream the filtered report as CSV or JSON Lines without loading it into memory"""
+    attendances = filter_attendances(
+        Attendance.objects.all(),
+        request.GET.get('course', ''),
+        request.GET.get('student', ''),
+        request.GET.get('date_from', ''),
+        request.GET.get('date_to', ''),
+    )
     
+    if request.GET.get('format') == 'jsonl':
+        response = StreamingHttpResponse(stream_jsonl(attendances), content_type='application/x-ndjson')
+        filename = 'attendance_report.jsonl'
+    else:
+        response = StreamingHttpResponse(stream_csv(attendances), content_type='text/csv')
+        filename = 'attendance_report.csv'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def dashboard(request):
     context = {
-        'total_students': total_students,
-        'total_courses': total_courses,
-        'today_sessions': today_sessions,
-        'recent_sessions': recent_sessions,
-        'low_attendance_students': low_attendance_students,
+        **get_counts(),
+        'recent_sessions': get_recent_sessions(),
+        'low_attendance_students': get_low_attendance_students(),
     }
     return render(request, 'core/dashboard.html', context)
+
+
+def dashboard_cache_stats(request):
+    """Hit/miss counters of the cached home and dashboard figures (this process)"""
+    return JsonResponse(summary_cache_stats())
+
+
+def metrics(request):
+    """Prometheus scrape endpoint for this process"""
+    cache_stats = summary_cache_stats()
+    extra_counters = [
+        (('summary_cache_hits_total', ()), cache_stats['hits']),
+        (('summary_cache_misses_total', ()), cache_stats['misses']),
+        (('summary_cache_invalidations_total', ()), cache_stats['invalidations']),
+    ]
+    return HttpResponse(
+        registry.render(extra_counters),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )